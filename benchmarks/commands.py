@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""Measures zoocli commands against an in-memory fake ZooKeeper with injected latency.
+
+Reports the number of requests (round trips) and wall time of each scenario,
+so changes to the request patterns can be checked without a real cluster.
+Run from the repository root: python3 -m benchmarks.commands [--latency ms] [--scale factor] [-v]
+"""
+import argparse
+import tempfile
+import time
+import os
+from unittest.mock import patch
+
+from zoocli import ZooCLI
+from zoocli.output import is_stream
+
+from benchmarks.fake import FakeZooKeeper, wide_tree, deep_tree, large_data_tree
+
+
+def scenarios(scale):
+    wide = int(2000 * scale)
+    dump = os.path.join(tempfile.gettempdir(), 'zoocli-benchmark.dump')
+
+    def populate_wide(client):
+        wide_tree(client, '/wide', wide, data_size=32)
+
+    def populate_deep(client):
+        deep_tree(client, '/deep', 5, 4 if scale < 2 else 6, data_size=32)
+
+    def populate_large(client):
+        large_data_tree(client, '/large', max(int(50 * scale), 1), 256 * 1024)
+
+    def complete(cli):
+        return cli._completer.path('/wide/', 'node00000000')
+
+    return [
+        ("ls wide", populate_wide, ['ls', '/wide']),
+        ("ls wide (cached)", populate_wide, [['ls', '/wide'], ['ls', '/wide']]),
+        ("ls -c wide", populate_wide, ['ls', '-c', '/wide']),
+        ("ls --tail wide", populate_wide, ['ls', '--tail', '10', '/wide']),
+        ("completion", populate_wide, complete),
+        ("find deep", populate_deep, ['find', '/deep']),
+        ("find -size deep", populate_deep, ['find', '/deep', '-size', '+10']),
+        ("du deep", populate_deep, ['du', '/deep']),
+        ("grep -r deep", populate_deep, ['grep', '-r', '-l', 'x', '/deep']),
+        ("get glob wide", populate_wide, ['get', '/wide/node000000001*']),
+        ("get large", populate_large, ['get', '/large/*']),
+        ("dump deep", populate_deep, ['dump', '/deep', dump]),
+        ("cp -r deep", populate_deep, ['cp', '-r', '/deep', '/copy']),
+        ("mv deep", populate_deep, ['mv', '/deep', '/moved']),
+        ("rm -r wide", populate_wide, ['rm', '-r', '/wide']),
+        ("rm -r deep", populate_deep, ['rm', '-r', '/deep']),
+    ]
+
+
+def run(cli, command):
+    if callable(command):
+        return command(cli)
+
+    commands = command if isinstance(command[0], list) else [command]
+    for args in commands:
+        result = cli.execute(*args)
+        # Streams only do their work as they are consumed
+        if is_stream(result):
+            for _ in result:
+                pass
+
+
+def measure(populate, command, latency):
+    client = FakeZooKeeper(latency)
+    populate(client)
+    nodes = len(client)
+
+    with patch('zoocli.zookeeper.KazooClient', lambda hosts: client):
+        cli = ZooCLI()
+        cli._verbose = False
+        cli.commands.zookeeper
+        client.requests.clear()
+
+        start = time.perf_counter()
+        run(cli, command)
+        wall = time.perf_counter() - start
+
+        cli.commands.zookeeper.stop()
+
+    return nodes, dict(client.requests), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zoocli commands against a fake ZooKeeper.")
+    parser.add_argument("--latency", type=float, default=1.0, help="round trip time of each request, in ms")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of generated trees")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show requests per operation")
+    args = parser.parse_args()
+
+    print("{:<20} {:>8} {:>10} {:>10}".format("scenario", "nodes", "requests", "wall [ms]"))
+    for name, populate, command in scenarios(args.scale):
+        nodes, requests, wall = measure(populate, command, args.latency / 1000)
+        print("{:<20} {:>8} {:>10} {:>10.1f}".format(name, nodes, sum(requests.values()), wall * 1000))
+
+        if args.verbose:
+            for operation, count in sorted(requests.items()):
+                print("    {:<16} {:>10}".format(operation, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""In-memory fake of the KazooClient surface used by zoocli, with injected latency.
+
+Every request takes `latency` seconds to complete. Synchronous calls sleep
+for it; async results are applied when sent, like ZooKeeper applies a
+session's requests in order, and their get() waits until the round trip is
+over, so pipelined requests overlap as they would on a real connection.
+"""
+import os
+import time
+import threading
+from kazoo.exceptions import (BadVersionError, KazooException, NoNodeError, NodeExistsError, NotEmptyError,
+                              RolledBackError, RuntimeInconsistency)
+from kazoo.protocol.states import EventType, KazooState, WatchedEvent, ZnodeStat
+from kazoo.security import OPEN_ACL_UNSAFE
+
+SESSION_ID = 0x1234
+
+
+class FakeResult(object):
+    """Async result that becomes available at `due`, with the parts of kazoo's interface zoocli uses."""
+
+    def __init__(self, due, value=None, exception=None):
+        self._due = due
+        self._callbacks = []
+        self.value = value
+        self.exception = exception
+
+    def get(self, block=True, timeout=None):
+        delay = self._due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+    def successful(self):
+        return self.exception is None
+
+    def rawlink(self, callback):
+        self._callbacks.append(callback)
+
+
+class FakeNode(object):
+    __slots__ = ('data', 'acl', 'children', 'czxid', 'mzxid', 'pzxid', 'ctime', 'mtime',
+                 'version', 'cversion', 'aversion', 'owner')
+
+    def __init__(self, data, acl, zxid, owner=0):
+        self.data = data
+        self.acl = acl
+        self.children = set()
+        self.czxid = self.mzxid = self.pzxid = zxid
+        self.ctime = self.mtime = int(time.time() * 1000)
+        self.version = self.cversion = self.aversion = 0
+        self.owner = owner
+
+    def copy(self):
+        node = FakeNode(self.data, self.acl, self.czxid, self.owner)
+        for name in self.__slots__:
+            setattr(node, name, getattr(self, name))
+        node.children = set(self.children)
+        return node
+
+    def stat(self):
+        return ZnodeStat(czxid=self.czxid, mzxid=self.mzxid, ctime=self.ctime, mtime=self.mtime,
+                         version=self.version, cversion=self.cversion, aversion=self.aversion,
+                         ephemeralOwner=self.owner, dataLength=len(self.data),
+                         numChildren=len(self.children), pzxid=self.pzxid)
+
+
+class FakeZooKeeper(object):
+    """Single-session in-memory ZooKeeper, counting requests by operation."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = {}
+        self._zxid = 1
+        self._nodes = {'/': FakeNode(b"", OPEN_ACL_UNSAFE, 0)}
+        self._data_watches = {}
+        self._child_watches = {}
+        self._undo = None
+        self._lock = threading.RLock()
+
+    # Setting up trees, without requests or latency
+
+    def add(self, path, data=b""):
+        """Creates the node, and any missing parents, directly in the store."""
+        with self._lock:
+            parent = os.path.dirname(path)
+            if parent not in self._nodes:
+                self.add(parent)
+            if path not in self._nodes:
+                self._create(path, data, None, False, False)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    # Session
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def add_listener(self, listener):
+        listener(KazooState.CONNECTED)
+
+    def add_auth(self, scheme, credential):
+        pass
+
+    # Requests
+
+    def get(self, path, watch=None):
+        return self._call('get', self._get, path, watch)
+
+    def get_async(self, path, watch=None):
+        return self._call_async('get', self._get, path, watch)
+
+    def get_children(self, path, watch=None, include_data=False):
+        return self._call('get_children', self._get_children, path, watch, include_data)
+
+    def get_children_async(self, path, watch=None, include_data=False):
+        return self._call_async('get_children', self._get_children, path, watch, include_data)
+
+    def exists(self, path, watch=None):
+        return self._call('exists', self._exists, path, watch)
+
+    def exists_async(self, path, watch=None):
+        return self._call_async('exists', self._exists, path, watch)
+
+    def create(self, path, value=b"", acl=None, ephemeral=False, sequence=False, makepath=False):
+        if makepath:
+            self.ensure_path(os.path.dirname(path))
+        return self._call('create', self._create, path, value, acl, ephemeral, sequence)
+
+    def create_async(self, path, value=b"", acl=None, ephemeral=False, sequence=False):
+        return self._call_async('create', self._create, path, value, acl, ephemeral, sequence)
+
+    def set(self, path, value, version=-1):
+        return self._call('set', self._set, path, value, version)
+
+    def set_async(self, path, value, version=-1):
+        return self._call_async('set', self._set, path, value, version)
+
+    def delete(self, path, version=-1, recursive=False):
+        if recursive:
+            for child in sorted(self.get_children(path)):
+                self.delete(os.path.join(path, child), recursive=True)
+        return self._call('delete', self._delete, path, version)
+
+    def delete_async(self, path, version=-1):
+        return self._call_async('delete', self._delete, path, version)
+
+    def get_acls(self, path):
+        return self._call('get_acls', self._get_acls, path)
+
+    def get_acls_async(self, path):
+        return self._call_async('get_acls', self._get_acls, path)
+
+    def set_acls(self, path, acls, version=-1):
+        return self._call('set_acls', self._set_acls, path, acls, version)
+
+    def set_acls_async(self, path, acls, version=-1):
+        return self._call_async('set_acls', self._set_acls, path, acls, version)
+
+    def ensure_path(self, path, acl=None):
+        """Creates missing nodes of the path, one request for each like kazoo does."""
+        missing = []
+        while path != '/' and not self.exists(path):
+            missing.append(path)
+            path = os.path.dirname(path)
+
+        for node in reversed(missing):
+            try:
+                self.create(node, b"", acl)
+            except NodeExistsError:
+                pass
+        return True
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    # Request handling
+
+    def _count(self, operation):
+        with self._lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def _call(self, operation, method, *args):
+        self._count(operation)
+        time.sleep(self.latency)
+        return self._apply(method, *args)
+
+    def _call_async(self, operation, method, *args):
+        self._count(operation)
+        due = time.perf_counter() + self.latency
+        try:
+            return FakeResult(due, self._apply(method, *args))
+        except KazooException as exc:
+            return FakeResult(due, exception=exc)
+
+    def _apply(self, method, *args):
+        events = []
+        with self._lock:
+            value = method(*args, events=events)
+
+        # Watches fire once, after the request is applied
+        for watch, event in events:
+            watch(event)
+        return value
+
+    def _node(self, path):
+        node = self._nodes.get(path)
+        if node is None:
+            raise NoNodeError()
+        return node
+
+    def _next_zxid(self):
+        self._zxid += 1
+        return self._zxid
+
+    def _backup(self, *paths):
+        if self._undo is None:
+            return
+        for path in paths:
+            if path not in self._undo:
+                node = self._nodes.get(path)
+                self._undo[path] = node.copy() if node else None
+
+    def _trigger(self, watches, path, type, events):
+        for watch in watches.pop(path, ()):
+            events.append((watch, WatchedEvent(type, KazooState.CONNECTED, path)))
+
+    def _get(self, path, watch, events=None):
+        node = self._node(path)
+        if watch:
+            self._data_watches.setdefault(path, set()).add(watch)
+        return node.data, node.stat()
+
+    def _get_children(self, path, watch, include_data, events=None):
+        node = self._node(path)
+        if watch:
+            self._child_watches.setdefault(path, set()).add(watch)
+        children = list(node.children)
+        return (children, node.stat()) if include_data else children
+
+    def _exists(self, path, watch, events=None):
+        if watch:
+            self._data_watches.setdefault(path, set()).add(watch)
+        node = self._nodes.get(path)
+        return node.stat() if node else None
+
+    def _create(self, path, value, acl, ephemeral, sequence, events=None):
+        parent_path = os.path.dirname(path)
+        parent = self._node(parent_path)
+        if sequence:
+            path = "{}{:010d}".format(path, parent.cversion)
+        if path in self._nodes:
+            raise NodeExistsError()
+
+        self._backup(path, parent_path)
+        parent = self._nodes[parent_path]
+        zxid = self._next_zxid()
+        self._nodes[path] = FakeNode(value or b"", acl or OPEN_ACL_UNSAFE, zxid, SESSION_ID if ephemeral else 0)
+        parent.children.add(os.path.basename(path))
+        parent.cversion += 1
+        parent.pzxid = zxid
+
+        if events is not None:
+            self._trigger(self._data_watches, path, EventType.CREATED, events)
+            self._trigger(self._child_watches, parent_path, EventType.CHILD, events)
+        return path
+
+    def _set(self, path, value, version, events=None):
+        node = self._node(path)
+        if version != -1 and version != node.version:
+            raise BadVersionError()
+
+        self._backup(path)
+        node = self._nodes[path]
+        node.data = value
+        node.version += 1
+        node.mzxid = self._next_zxid()
+        node.mtime = int(time.time() * 1000)
+
+        if events is not None:
+            self._trigger(self._data_watches, path, EventType.CHANGED, events)
+        return node.stat()
+
+    def _delete(self, path, version, events=None):
+        node = self._node(path)
+        if version != -1 and version != node.version:
+            raise BadVersionError()
+        if node.children:
+            raise NotEmptyError()
+
+        parent_path = os.path.dirname(path)
+        self._backup(path, parent_path)
+        del self._nodes[path]
+        parent = self._nodes[parent_path]
+        parent.children.discard(os.path.basename(path))
+        parent.cversion += 1
+        parent.pzxid = self._next_zxid()
+
+        if events is not None:
+            self._trigger(self._data_watches, path, EventType.DELETED, events)
+            self._trigger(self._child_watches, path, EventType.DELETED, events)
+            self._trigger(self._child_watches, parent_path, EventType.CHILD, events)
+        return True
+
+    def _get_acls(self, path, events=None):
+        node = self._node(path)
+        return list(node.acl), node.stat()
+
+    def _set_acls(self, path, acls, version, events=None):
+        node = self._node(path)
+        if version != -1 and version != node.aversion:
+            raise BadVersionError()
+
+        self._backup(path)
+        node = self._nodes[path]
+        node.acl = list(acls)
+        node.aversion += 1
+        return node.stat()
+
+    def _commit(self, operations):
+        """Applies all operations or none, returning kazoo-like results."""
+        events = []
+        with self._lock:
+            self._undo = {}
+            results = []
+            try:
+                for method, args in operations:
+                    try:
+                        results.append(method(*args, events=events))
+                    except KazooException as exc:
+                        for path, node in self._undo.items():
+                            if node is None:
+                                self._nodes.pop(path, None)
+                            else:
+                                self._nodes[path] = node
+                        failed = len(results)
+                        events = []
+                        return ([RolledBackError()] * failed + [exc]
+                                + [RuntimeInconsistency()] * (len(operations) - failed - 1))
+            finally:
+                self._undo = None
+
+        for watch, event in events:
+            watch(event)
+        return results
+
+
+class FakeTransaction(object):
+    def __init__(self, client):
+        self._client = client
+        self.operations = []
+
+    def create(self, path, value=b"", acl=None, ephemeral=False, sequence=False):
+        self.operations.append((self._client._create, (path, value, acl, ephemeral, sequence)))
+
+    def delete(self, path, version=-1):
+        self.operations.append((self._client._delete, (path, version)))
+
+    def set_data(self, path, value, version=-1):
+        self.operations.append((self._client._set, (path, value, version)))
+
+    def commit(self):
+        return self.commit_async().get()
+
+    def commit_async(self):
+        self._client._count('transaction')
+        due = time.perf_counter() + self._client.latency
+        return FakeResult(due, self._client._commit(self.operations))
+
+
+# Synthetic trees, written directly into the store
+
+def wide_tree(client, root, count, data_size=0):
+    """One level of `count` children, e.g. a large queue or service registry."""
+    data = b"x" * data_size
+    client.add(root)
+    for index in range(count):
+        client.add("{}/node{:010d}".format(root, index), data)
+
+
+def deep_tree(client, root, depth, fanout, data_size=0):
+    """Full tree with `fanout` children per node, `depth` levels below the root."""
+    data = b"x" * data_size
+    client.add(root)
+    level = [root]
+    for _ in range(depth):
+        level = ["{}/n{}".format(parent, index) for parent in level for index in range(fanout)]
+        for path in level:
+            client.add(path, data)
+
+
+def large_data_tree(client, root, count, data_size):
+    """Few nodes holding large payloads, close to ZooKeeper's 1 MB limit if asked."""
+    wide_tree(client, root, count, data_size)
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+"""Measures zoocli startup time on paths that don't need ZooKeeper.
+
+Each scenario runs in a fresh interpreter, so import costs are included.
+Run from the repository root: python3 benchmarks/startup.py [runs]
+"""
+import os
+import sys
+import time
+import subprocess
+
+SCENARIOS = {
+    'import': "import zoocli",
+    'construct': "from zoocli import ZooCLI; ZooCLI()",
+    'help': "from zoocli import ZooCLI; ZooCLI().execute('help')",
+    'argument error': (
+        "from climb.exceptions import CLIException\n"
+        "from zoocli import ZooCLI\n"
+        "try:\n"
+        "    ZooCLI().execute('unknown')\n"
+        "except CLIException:\n"
+        "    pass"
+    ),
+}
+
+# Appended to each scenario to make sure no connection (or kazoo import) happened
+CHECK = "\nimport sys\nassert 'kazoo' not in sys.modules, 'kazoo was imported'"
+
+
+def measure(code, runs):
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code + CHECK], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    baseline = measure("pass", runs)
+    print("{:<16} {:>10} {:>10}".format("scenario", "min [ms]", "median [ms]"))
+    for name, code in [('interpreter', "pass")] + list(SCENARIOS.items()):
+        timings = baseline if name == 'interpreter' else measure(code, runs)
+        timings.sort()
+        print("{:<16} {:>10.1f} {:>10.1f}".format(name, timings[0] * 1000, timings[len(timings) // 2] * 1000))
+
+
+if __name__ == "__main__":
+    main()
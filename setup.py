@@ -7,7 +7,7 @@ setup(name='zoocli',
       author='Milosz Smolka',
       author_email='m110@m110.pl',
       url='https://github.com/m110/zoocli',
-      packages=find_packages(exclude=['tests']),
+      packages=find_packages(exclude=['tests', 'benchmarks']),
       scripts=['scripts/zoocli'],
       data_files=[('/etc/zoocli', ['zoocli.conf.example'])],
       install_requires=['climb', 'kazoo'],
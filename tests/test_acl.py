@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import patch
+from kazoo.security import OPEN_ACL_UNSAFE, READ_ACL_UNSAFE, make_acl, make_digest_acl
+from climb.exceptions import CLIException
+
+from zoocli import ZooCLI
+from zoocli.exceptions import ZooKeeperException
+from zoocli.zookeeper import format_acl, parse_acl
+
+from benchmarks.fake import FakeZooKeeper, deep_tree
+
+ADMIN = make_digest_acl('admin', 'secret', all=True)
+
+
+class AclTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeZooKeeper()
+        deep_tree(self.client, '/app', 2, 2)
+
+        self.zookeeper_patcher = patch('zoocli.zookeeper.KazooClient', lambda hosts: self.client)
+        self.zookeeper_patcher.start()
+
+        self.cli = ZooCLI()
+        self.cli._verbose = False
+
+    def tearDown(self):
+        self.zookeeper_patcher.stop()
+
+    def output(self, *args):
+        return "".join(self.cli.execute(*args))
+
+    def acls(self):
+        return {node: self.client.get_acls(node)[0] for node, _, _, _ in self.cli.commands.zookeeper.walk('/app')}
+
+    def test_parse_acl(self):
+        acl = parse_acl("world:anyone:r,digest:admin:hash=:cdrwa")
+        self.assertEqual(acl[0], READ_ACL_UNSAFE[0])
+        self.assertEqual(acl[1], make_acl('digest', 'admin:hash=', all=True))
+        self.assertEqual(format_acl(acl), "world:anyone:r,digest:admin:hash=:acdrw")
+
+        with self.assertRaises(ZooKeeperException):
+            parse_acl("world:anyone:x")
+        with self.assertRaises(ZooKeeperException):
+            parse_acl("anyone:r")
+
+    def test_addacl(self):
+        self.cli.execute('addacl', '/app/n0', 'cdrwa', 'digest', 'admin:secret')
+        self.assertEqual(self.client.get_acls('/app/n0')[0], OPEN_ACL_UNSAFE + [ADMIN])
+        audit = self.output('addacl', '--audit', '-r', '/app', 'cdrwa', 'digest', 'admin:secret').splitlines()
+        self.assertEqual(len(audit), 6)
+        self.assertEqual(audit[1], "/app/n1: world:anyone:acdrw")
+
+        # Nodes that comply already are not written
+        self.client.requests.clear()
+        self.cli.execute('addacl', '-r', '/app', 'cdrwa', 'digest', 'admin:secret')
+        self.assertEqual(self.client.requests['set_acls'], 6)
+        self.assertTrue(all(acl == OPEN_ACL_UNSAFE + [ADMIN] for acl in self.acls().values()))
+
+        # Permissions of the same id are replaced
+        self.cli.execute('addacl', '/app', 'r', 'digest', 'admin:secret')
+        self.assertEqual(self.client.get_acls('/app')[0][1].perms, 1)
+
+    def test_rmacl(self):
+        self.client.set_acls('/app/n1', OPEN_ACL_UNSAFE + [ADMIN])
+
+        self.cli.execute('rmacl', '/app/n1', '1')
+        self.assertEqual(self.client.get_acls('/app/n1')[0], OPEN_ACL_UNSAFE)
+
+        self.client.set_acls('/app/n1/n0', [ADMIN] + OPEN_ACL_UNSAFE)
+        self.assertEqual(self.output('rmacl', '--audit', '-r', '/app', 'digest', 'admin:secret'),
+                         "/app/n1/n0: {}\n".format(format_acl([ADMIN] + OPEN_ACL_UNSAFE)))
+
+        self.cli.execute('rmacl', '-r', '/app', 'digest', 'admin:secret')
+        self.assertEqual(self.client.get_acls('/app/n1/n0')[0], OPEN_ACL_UNSAFE)
+
+        with self.assertRaises(CLIException):
+            self.cli.execute('rmacl', '-r', '/app', '0')
+        with self.assertRaises(ZooKeeperException):
+            self.cli.execute('rmacl', '/app', '5')
+
+    def test_missing(self):
+        for args in (['addacl', '-r', '/missing', 'r', 'world', 'anyone'],
+                     ['addacl', '--audit', '-r', '/missing', 'r', 'world', 'anyone'],
+                     ['rmacl', '-r', '/missing', 'world', 'anyone'],
+                     ['setacl', '--audit', '/missing', 'world:anyone:r'],
+                     ['setacl', '/missing', 'world:anyone:r']):
+            with self.assertRaises(ZooKeeperException):
+                self.output(*args)
+
+    def test_setacl(self):
+        self.assertEqual(self.output('setacl', '--audit', '-r', '/app', 'world:anyone:cdrwa'), "")
+        self.client.set_acls('/app/n0/n1', READ_ACL_UNSAFE)
+
+        # Another client changes an ACL between it being read and written
+        get_acls_async = self.client.get_acls_async
+
+        def racing(path):
+            result = get_acls_async(path)
+            if path == '/app/n1':
+                self.client.set_acls(path, OPEN_ACL_UNSAFE + [ADMIN])
+            return result
+
+        self.client.requests.clear()
+        with patch.object(self.client, 'get_acls_async', racing):
+            self.cli.execute('setacl', '-r', '/app', 'world:anyone:r')
+
+        self.assertTrue(all(acl == READ_ACL_UNSAFE for acl in self.acls().values()))
+        # The racing write, 6 version-checked writes and the retry of the conflicting one
+        self.assertEqual(self.client.requests['set_acls'], 1 + 6 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+import io
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+from unittest.mock import patch, MagicMock
+from kazoo.exceptions import NoNodeError
+
+from zoocli import ZooCLI
+from zoocli.batch import run_script, run_request
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.zookeeper_patcher = patch('zoocli.zookeeper.KazooClient')
+        self.zookeeper = self.zookeeper_patcher.start()
+        self.zookeeper.return_value = self.zookeeper
+
+        self.cli = ZooCLI()
+        self.cli._verbose = False
+
+    def tearDown(self):
+        self.zookeeper_patcher.stop()
+
+    def run_script(self, script, **kwargs):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = run_script(self.cli, script.splitlines(), **kwargs)
+        return status, output.getvalue()
+
+    def test_script(self):
+        def get_async(path):
+            result = MagicMock()
+            result.get.return_value = (path.encode(), None)
+            return result
+
+        self.zookeeper.get_async.side_effect = get_async
+        self.zookeeper.get_children.return_value = ['a', 'b']
+
+        script = "\n".join([
+            "# comment",
+            "get /x",
+            "",
+            "cd /x",
+            "get y  # relative to /x",
+            "ls",
+            "get /z",
+        ])
+
+        status, output = self.run_script(script, jobs=2)
+        self.assertEqual(status, 0)
+        self.assertEqual(output, "/x\n/x/y\na b\n/z\n")
+        self.assertEqual(self.cli.current_path, '/x')
+
+    def test_timing(self):
+        self.zookeeper.get_children.return_value = ['a', 'b']
+
+        output = io.StringIO()
+        errors = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(errors):
+            status = run_request(self.cli, {'command': ['ls', '/'], 'timing': True})
+
+        self.assertEqual((status, output.getvalue()), (0, "a b\n"))
+        lines = errors.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("Wall time: "))
+        self.assertEqual(lines[2].split()[:2], ['get_children', '1'])
+
+    def test_errors(self):
+        self.zookeeper.get_async.return_value.get.side_effect = NoNodeError
+
+        status, output = self.run_script("get /a\nget /b")
+        self.assertEqual(status, 1)
+        self.assertEqual(output, "Line 1: No such node: /a\n")
+
+        status, output = self.run_script("get /a\nunknown\nget /b", keep_going=True)
+        self.assertEqual(status, 1)
+        self.assertEqual(output.count("Line"), 3)
+        self.assertTrue(output.startswith("Line 1: No such node: /a\nLine 2: "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import patch
+from kazoo.exceptions import NodeExistsError, NoNodeError, NotEmptyError
+
+from zoocli import ZooCLI
+
+from benchmarks.commands import measure, scenarios
+from benchmarks.fake import FakeZooKeeper, deep_tree
+
+
+class FakeZooKeeperTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeZooKeeper()
+        deep_tree(self.client, '/app', 2, 2)
+
+    def test_requests(self):
+        self.assertEqual(sorted(self.client.get_children('/app')), ['n0', 'n1'])
+        self.assertEqual(self.client.create('/app/s-', b"data", sequence=True), '/app/s-0000000002')
+        self.assertEqual(self.client.set('/app/n0', b"new").version, 1)
+        self.assertEqual(self.client.get_async('/app/n0').get()[0], b"new")
+
+        with self.assertRaises(NotEmptyError):
+            self.client.delete('/app/n0')
+
+        self.assertIsNone(self.client.exists_async('/missing').get())
+        with self.assertRaises(NoNodeError):
+            self.client.get_async('/missing').get()
+
+        self.assertEqual(self.client.requests['create'], 1)
+
+    def test_transaction(self):
+        transaction = self.client.transaction()
+        transaction.create('/app/new')
+        transaction.create('/app/n0')
+        results = transaction.commit()
+
+        self.assertIsInstance(results[1], NodeExistsError)
+        self.assertIsNone(self.client.exists('/app/new'))
+        self.assertEqual(self.client.requests['transaction'], 1)
+
+    def test_watches(self):
+        events = []
+        self.client.get_children('/app', watch=events.append)
+        self.client.create('/app/new')
+        self.client.create('/app/other')
+        self.assertEqual([event.path for event in events], ['/app'])
+
+    def test_cli(self):
+        with patch('zoocli.zookeeper.KazooClient', lambda hosts: self.client):
+            cli = ZooCLI()
+            cli._verbose = False
+            self.assertEqual("".join(cli.execute('find', '/app', '-maxdepth', '1')), "/app\n/app/n0\n/app/n1\n")
+
+            cli.execute('rm', '-r', '/app', '-b', '2')
+            self.assertEqual(len(self.client), 1)
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_measure(self):
+        name, populate, command = scenarios(0.01)[0]
+        nodes, requests, wall = measure(populate, command, 0)
+        self.assertEqual(requests, {'get_children': 1})
+        self.assertEqual(nodes, 22)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+import unittest
+
+from zoocli.cache import ChildrenCache, sizeof
+
+
+class ChildrenCacheTest(unittest.TestCase):
+    def test_get_put(self):
+        cache = ChildrenCache(1024 * 1024)
+        self.assertIsNone(cache.get('/a'))
+
+        cache.put('/a', ['b', 'c'], cache.generation)
+        self.assertEqual(cache.get('/a'), ['b', 'c'])
+
+        cache.invalidate('/a')
+        self.assertIsNone(cache.get('/a'))
+
+    def test_stale_generation(self):
+        cache = ChildrenCache(1024 * 1024)
+        generation = cache.generation
+
+        # Invalidated while the list was being fetched
+        cache.invalidate('/a')
+        cache.put('/a', ['b'], generation)
+        self.assertIsNone(cache.get('/a'))
+
+    def test_eviction(self):
+        entry_size = sizeof('/a', ['x'])
+        cache = ChildrenCache(entry_size * 2)
+
+        cache.put('/a', ['x'], cache.generation)
+        cache.put('/b', ['x'], cache.generation)
+        cache.get('/a')
+        cache.put('/c', ['x'], cache.generation)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('/b'))
+        self.assertEqual(cache.get('/a'), ['x'])
+        self.assertEqual(cache.get('/c'), ['x'])
+
+        # Entries larger than the limit are never cached
+        cache.put('/d', ['x'] * 100, cache.generation)
+        self.assertIsNone(cache.get('/d'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import patch
+from climb.config import config
+from climb.exceptions import CLIException
+
+from zoocli import ZooCLI
+from zoocli.clusters import cluster_config, split_cluster
+
+from benchmarks.fake import FakeZooKeeper
+
+
+class ClustersTest(unittest.TestCase):
+    def setUp(self):
+        self.zookeeper_patcher = patch('zoocli.zookeeper.KazooClient', lambda hosts: self.clients[hosts])
+        self.zookeeper_patcher.start()
+
+        # Loads the configuration
+        self.cli = ZooCLI()
+        self.cli._verbose = False
+        config.read_dict({'cluster:prod': {'hosts': 'prod1:2181,prod2:2181', 'user': 'admin', 'password': 'secret'}})
+
+        self.clients = {config['zookeeper']['hosts']: FakeZooKeeper(), 'prod1:2181,prod2:2181': FakeZooKeeper()}
+        self.default, self.prod = self.clients.values()
+        for client, data in ((self.default, b"1"), (self.prod, b"2")):
+            client.add('/config/a', b"a")
+            client.add('/config/b', data)
+        self.prod.add('/config/c')
+
+    def tearDown(self):
+        self.zookeeper_patcher.stop()
+        config.remove_section('cluster:prod')
+
+    def output(self, *args):
+        return "".join(self.cli.execute(*args))
+
+    def test_split_cluster(self):
+        self.assertEqual(split_cluster('prod:/config'), ('prod', '/config'))
+        self.assertEqual(split_cluster('default:config'), ('default', 'config'))
+        # Colons are allowed in node names
+        self.assertEqual(split_cluster('/a:b'), (None, '/a:b'))
+        self.assertEqual(split_cluster('test:/config'), (None, 'test:/config'))
+
+        self.assertEqual(cluster_config('prod')['user'], 'admin')
+        with self.assertRaises(CLIException):
+            cluster_config('test')
+
+    def test_connect(self):
+        self.cli.execute('cd', '/config')
+        self.assertEqual(self.cli.execute('connect').splitlines(),
+                         ["* default\tconnected\t{}".format(config['zookeeper']['hosts']),
+                          "  prod\t-\tprod1:2181,prod2:2181"])
+
+        self.cli.execute('connect', 'prod')
+        self.assertEqual(self.cli.current_path, '/')
+        self.assertEqual(self.cli._format_prompt(), "[prod:/]> ")
+        self.assertEqual(self.output('ls', 'config'), "a b c\n")
+
+        # Each cluster keeps its current path
+        self.cli.execute('connect', 'default')
+        self.assertEqual(self.cli.current_path, '/config')
+        self.assertEqual(self.output('ls'), "a b\n")
+
+        self.cli.execute('cd', 'prod:/config')
+        self.assertEqual(self.cli.commands.cluster, 'prod')
+        self.assertEqual(self.cli._completer.path('default:/config/', 'a'), ['a/'])
+
+        with self.assertRaises(CLIException):
+            self.cli.execute('connect', 'test')
+
+    def test_addressing(self):
+        self.assertEqual(self.output('ls', 'prod:/config'), "a b c\n")
+        self.assertEqual(self.output('get', '-p', '/config/b', 'prod:/config/b', 'prod:/config/a'),
+                         "/config/b: 1\nprod:/config/b: 2\nprod:/config/a: a\n")
+        self.assertEqual(self.output('diff', '/config', 'prod:/config'), "A /c\nM /b\n")
+
+        self.cli.execute('cp', '-r', 'prod:/config', '/prod')
+        self.assertEqual(self.output('ls', '/prod'), "a b c\n")
+        self.cli.execute('mv', '/prod', 'prod:/copy')
+        self.assertEqual(self.output('get', 'prod:/copy/b'), "2\n")
+        self.assertIsNone(self.default.exists('/prod'))
+
+        self.cli.execute('set', 'prod:/config/b', '1')
+        self.assertEqual(self.prod.get('/config/b')[0], b"1")
+        self.assertEqual(self.default.requests.get('set'), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,27 @@
 #!/usr/bin/python3
+import io
+import os
+import json
+import tempfile
 import unittest
-from unittest.mock import patch
-from kazoo.exceptions import NoNodeError
-from climb.exceptions import MissingArgument
+from contextlib import redirect_stdout
+from unittest.mock import patch, call, ANY, MagicMock
+from kazoo.exceptions import NoNodeError, NodeExistsError, RolledBackError
+from kazoo.protocol.states import EventType, KazooState, WatchedEvent, ZnodeStat
+from kazoo.security import OPEN_ACL_UNSAFE
+from climb.config import config
+from climb.exceptions import MissingArgument, CLIException
 
 from zoocli import ZooCLI
+from zoocli.dump import Record, dump_writer, read_dump, read_snapshot
 from zoocli.exceptions import ZooKeeperException
+from zoocli.output import write_result
+
+
+def make_stat(data_length=0, children_count=0, mzxid=1, version=0):
+    return ZnodeStat(czxid=1, mzxid=mzxid, ctime=0, mtime=0, version=version, cversion=0,
+                     aversion=0, ephemeralOwner=0, dataLength=data_length,
+                     numChildren=children_count, pzxid=1)
 
 
 class CommandsTest(unittest.TestCase):
@@ -20,15 +36,126 @@ class CommandsTest(unittest.TestCase):
     def tearDown(self):
         self.zookeeper_patcher.stop()
 
+    def output(self, *args):
+        return "".join(self.cli.execute(*args))
+
+    def mock_tree(self, tree, data=None):
+        def get_children_async(path, watch=None, include_data=False):
+            result = MagicMock()
+            if path in tree:
+                value = data.get(path, b"") if data else b""
+                stat = make_stat(len(value), len(tree[path]))
+                result.get.return_value = (tree[path], stat) if include_data else tree[path]
+            else:
+                result.get.side_effect = NoNodeError
+            return result
+
+        def get_async(path, watch=None):
+            result = MagicMock()
+            if path in tree:
+                value = data.get(path, b"") if data else b""
+                result.get.return_value = (value, make_stat(len(value), len(tree[path])))
+            else:
+                result.get.side_effect = NoNodeError
+            return result
+
+        def get_acls_async(path):
+            result = MagicMock()
+            if path in tree:
+                result.get.return_value = (OPEN_ACL_UNSAFE, make_stat())
+            else:
+                result.get.side_effect = NoNodeError
+            return result
+
+        def get_children(path, watch=None):
+            if path not in tree:
+                raise NoNodeError
+            return tree[path]
+
+        def exists_async(path):
+            result = MagicMock()
+            result.get.return_value = make_stat(children_count=len(tree[path])) if path in tree else None
+            return result
+
+        self.zookeeper.get_children.side_effect = get_children
+        self.zookeeper.exists_async.side_effect = exists_async
+        self.zookeeper.get_children_async.side_effect = get_children_async
+        self.zookeeper.get_async.side_effect = get_async
+        self.zookeeper.get_acls_async.side_effect = get_acls_async
+
     def test_ls(self):
         self.zookeeper.get_children.return_value = ['a', 'b', 'c']
 
-        result = self.cli.execute('ls')
-        self.assertEqual(result, "a b c")
-        self.zookeeper.get_children.assert_called_once_with('/')
+        result = self.output('ls')
+        self.assertEqual(result, "a b c\n")
+        self.zookeeper.get_children.assert_called_once_with('/', watch=ANY)
+
+        # Served from the cache until the watch fires
+        result = self.output('ls', '-l')
+        self.assertEqual(result, "a\nb\nc\n")
+        self.assertEqual(self.zookeeper.get_children.call_count, 1)
+
+        watch = self.zookeeper.get_children.call_args[1]['watch']
+        watch(WatchedEvent(EventType.CHILD, KazooState.CONNECTED, '/'))
+        self.zookeeper.get_children.return_value = ['a', 'b']
+
+        result = self.output('ls')
+        self.assertEqual(result, "a b\n")
+        self.assertEqual(self.zookeeper.get_children.call_count, 2)
+
+        # Local writes invalidate the parent immediately
+        self.cli.execute('create', '/d')
+        self.zookeeper.get_children.return_value = ['a', 'b', 'd']
+
+        result = self.output('ls')
+        self.assertEqual(result, "a b d\n")
+
+        watch(WatchedEvent(EventType.CHILD, KazooState.CONNECTED, '/'))
+        self.zookeeper.get_children.return_value = ['d', 'a']
+
+        result = self.output('ls', '--no-sort')
+        self.assertEqual(result, "d a\n")
+
+    def test_ls_paging(self):
+        children = ['lock-{:010d}'.format(number) for number in (5, 1, 3, 4, 2)] + ['other']
+        self.zookeeper.get_children.return_value = children
+        self.zookeeper.exists.return_value = make_stat(children_count=6)
+
+        self.assertEqual(self.cli.execute('ls', '-c', '/queue'), "6")
+        self.zookeeper.get_children.assert_not_called()
 
-        result = self.cli.execute('ls', '-l')
-        self.assertEqual(result, "a\nb\nc")
+        self.assertEqual(self.output('ls', '--head', '2', '/queue'), "lock-0000000001 lock-0000000002\n")
+        self.assertEqual(self.output('ls', '--tail', '2', '/queue'), "lock-0000000005 other\n")
+        self.assertEqual(self.output('ls', '--range', '2:3', '/queue'), "lock-0000000002 lock-0000000003\n")
+        self.assertEqual(self.output('ls', '--range', '4:', '/queue'), "lock-0000000004 lock-0000000005\n")
+
+        with self.assertRaises(CLIException):
+            self.cli.execute('ls', '--range', '2-3', '/queue')
+
+    def test_ls_limit(self):
+        self.zookeeper.get_children.return_value = ['a', 'b', 'c']
+        self.zookeeper.exists.return_value = make_stat(children_count=3)
+
+        with patch.dict(config['zoocli'], {'ls_limit': '2'}):
+            with self.assertRaises(ZooKeeperException):
+                self.cli.execute('ls', '/any_node')
+            self.zookeeper.get_children.assert_not_called()
+
+            self.assertEqual(self.output('ls', '-f', '/any_node'), "a b c\n")
+
+            # Once cached, the list is served without checking
+            self.assertEqual(self.output('ls', '/any_node'), "a b c\n")
+
+    def test_interactive_streaming(self):
+        self.zookeeper.get_children.return_value = ['b', 'a']
+        self.cli._running = True
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            result = self.cli.execute('ls', '-l')
+
+        self.assertIsNone(result)
+        self.assertEqual(output.getvalue(), "a\nb\n")
 
     def test_cd(self):
         self.zookeeper.get_children.return_value = []
@@ -41,10 +168,30 @@ class CommandsTest(unittest.TestCase):
             self.cli.execute('cd', '/invalid_node')
 
     def test_get(self):
-        self.zookeeper.get.return_value = (b"any_data", None)
+        self.mock_tree({
+            '/app': ['a', 'b', 'c'],
+            '/app/a': ['x'],
+            '/app/b': [],
+            '/app/c': ['x'],
+            '/app/a/x': [],
+            '/app/c/x': [],
+        }, {'/app/a': b"one", '/app/b': b"\xff\x00", '/app/a/x': b"ax", '/app/c/x': b"cx"})
 
-        result = self.cli.execute('get', '/any_node')
-        self.assertEqual(result, 'any_data')
+        self.assertEqual(self.output('get', '/app/a'), "one\n")
+        self.assertEqual(self.output('get', '/app/a', '/app/b'), "one\n\\xff\x00\n")
+        self.assertEqual(self.output('get', '-x', '/app/b'), "ff00\n")
+        self.assertEqual(self.output('get', '-p', '/app/*/x'), "/app/a/x: ax\n/app/c/x: cx\n")
+        self.assertEqual(self.output('get', '/app/[ab]'), "one\n\\xff\x00\n")
+
+        output = io.TextIOWrapper(io.BytesIO(), write_through=True)
+        write_result(self.cli.execute('get', '-r', '/app/b', '/app/a'), output)
+        self.assertEqual(output.buffer.getvalue(), b"\xff\x00one")
+
+        with self.assertRaises(ZooKeeperException):
+            self.output('get', '/app/missing')
+
+        with self.assertRaises(ZooKeeperException):
+            self.output('get', '/app/*/missing')
 
     def test_set(self):
         with self.assertRaises(MissingArgument):
@@ -94,9 +241,455 @@ class CommandsTest(unittest.TestCase):
         self.cli.execute('rm', '/any_path')
         self.zookeeper.delete.assert_called_once_with('/any_path', recursive=False)
 
+        self.mock_tree({
+            '/any_path': ['a', 'b'],
+            '/any_path/a': ['c'],
+            '/any_path/a/c': [],
+            '/any_path/b': [],
+        })
+        transaction = self.zookeeper.transaction.return_value
+        transaction.commit_async.return_value.get.return_value = [True, True]
+
         self.zookeeper.delete.reset_mock()
-        self.cli.execute('rm', '/any_path', '-r')
-        self.zookeeper.delete.assert_called_once_with('/any_path', recursive=True)
+        self.cli.execute('rm', '/any_path', '-r', '-b', '2')
+        self.assertEqual(transaction.delete.call_args_list,
+                         [call('/any_path/a/c'), call('/any_path/b'),
+                          call('/any_path/a'), call('/any_path')])
+        self.assertEqual(transaction.commit_async.call_count, 2)
+        self.zookeeper.delete.assert_not_called()
+
+        # Failed batch is retried node by node
+        transaction.commit_async.return_value.get.return_value = [RolledBackError(), NoNodeError()]
+        self.cli.execute('rm', '/any_path', '-r', '-b', '2')
+        self.assertEqual(self.zookeeper.delete.call_args_list,
+                         [call('/any_path/a/c'), call('/any_path/b'),
+                          call('/any_path/a'), call('/any_path')])
+
+        with self.assertRaises(ZooKeeperException):
+            self.cli.execute('rm', '-r', '/missing')
+
+        # Nothing is deleted if a sub-node can't be listed
+        self.mock_tree({'/any_path': ['a', 'b'], '/any_path/b': []})
+        transaction.delete.reset_mock()
+        with self.assertRaises(ZooKeeperException):
+            self.cli.execute('rm', '-r', '/any_path')
+        transaction.delete.assert_not_called()
+
+    def test_find(self):
+        tree = {
+            '/': ['b', 'a'],
+            '/a': ['x'],
+            '/a/x': [],
+            '/b': ['y', 'x'],
+            '/b/x': [],
+            '/b/y': [],
+        }
+
+        self.mock_tree(tree)
+
+        result = self.output('find', '/')
+        self.assertEqual(result, "/\n/a\n/b\n/a/x\n/b/x\n/b/y\n")
+
+        result = self.output('find', '/', '-name', 'x')
+        self.assertEqual(result, "/a/x\n/b/x\n")
+
+        result = self.output('find', '/', '-name', 'x', '-print0')
+        self.assertEqual(result, "/a/x\0/b/x\0")
+
+        result = self.output('find', '/b', '--no-sort')
+        self.assertEqual(result, "/b\n/b/y\n/b/x\n")
+
+        result = self.output('find', '/', '-mindepth', '2', '-j', '1')
+        self.assertEqual(result, "/a/x\n/b/x\n/b/y\n")
+
+        self.zookeeper.get_children_async.reset_mock()
+        result = self.output('find', '/', '-maxdepth', '1')
+        self.assertEqual(result, "/\n/a\n/b\n")
+        self.zookeeper.get_children_async.assert_called_once_with('/', include_data=False)
+
+        with self.assertRaises(CLIException):
+            self.output('find', '/', '-j', '0')
+        with self.assertRaises(CLIException):
+            self.output('find', '/', '-name', '(')
+
+        # Only errors below the root are skipped
+        with self.assertRaises(ZooKeeperException):
+            self.output('find', '/missing', '-mindepth', '1')
+
+        # A missing root fails before anything is printed
+        with self.assertRaises(ZooKeeperException):
+            next(iter(self.cli.execute('find', '/missing')))
+        self.zookeeper.exists.return_value = None
+        with self.assertRaises(ZooKeeperException):
+            next(iter(self.cli.execute('find', '/missing', '-maxdepth', '0')))
+
+    def test_find_predicates(self):
+        self.mock_tree({
+            '/': ['a', 'b'],
+            '/a': ['x'],
+            '/a/x': [],
+            '/b': [],
+        })
+        stats = {
+            '/a': make_stat(10, 1),
+            '/a/x': make_stat(600)._replace(ephemeralOwner=0x1234),
+            '/b': make_stat(0, 0, version=3),
+        }
+
+        def exists_async(path):
+            result = MagicMock()
+            result.get.return_value = stats.get(path)
+            return result
+
+        self.zookeeper.exists_async.side_effect = exists_async
+
+        result = self.output('find', '/', '-ephemeral')
+        self.assertEqual(result, "/a/x\n")
+
+        result = self.output('find', '/', '-owner', '0x1234')
+        self.assertEqual(result, "/a/x\n")
+
+        result = self.output('find', '/', '-size', '+5', '-mindepth', '1')
+        self.assertEqual(result, "/a\n/a/x\n")
+
+        result = self.output('find', '/', '-size', '-5', '-mindepth', '1')
+        self.assertEqual(result, "/b\n")
+
+        result = self.output('find', '/', '-version', '3')
+        self.assertEqual(result, "/b\n")
+
+        # Name filter is applied before any stat is fetched
+        self.zookeeper.exists_async.reset_mock()
+        result = self.output('find', '/', '-name', 'x', '-children', '0')
+        self.assertEqual(result, "/a/x\n")
+        self.zookeeper.exists_async.assert_called_once_with('/a/x')
+
+        self.zookeeper.exists_async.reset_mock()
+        self.output('find', '/', '-name', 'x')
+        self.zookeeper.exists_async.assert_not_called()
+
+        with self.assertRaises(CLIException):
+            self.output('find', '/', '-size', 'large')
+
+    def test_grep(self):
+        self.mock_tree({
+            '/app': ['a', 'b', 'c'],
+            '/app/a': [],
+            '/app/b': [],
+            '/app/c': [],
+        }, {'/app': b"host=root", '/app/a': b"host=db1\nport=1\nHOST=db2", '/app/b': b"\xffhost=web",
+            '/app/c': b"port=2"})
+
+        self.assertEqual(self.output('grep', 'host', '/app'), "/app:host=root\n")
+        self.assertEqual(self.output('grep', '-r', 'host=', '/app'),
+                         "/app:host=root\n/app/a:host=db1\n/app/b:\\xffhost=web\n")
+        self.assertEqual(self.output('grep', '-r', '-i', '-c', 'host', '/app'), "/app:1\n/app/a:2\n/app/b:1\n")
+        self.assertEqual(self.output('grep', '-r', '-l', 'port', '/app'), "/app/a\n/app/c\n")
+
+        # Nodes over the size limit are skipped without fetching their data
+        self.zookeeper.get_async.reset_mock()
+        self.assertEqual(self.output('grep', '-r', '-l', '--max-size', '10', 'host', '/app'), "/app\n/app/b\n")
+        self.assertNotIn(call('/app/a'), self.zookeeper.get_async.call_args_list)
+
+        with self.assertRaises(MissingArgument):
+            self.output('grep')
+
+        with self.assertRaises(CLIException):
+            self.output('grep', '(', '/app')
+
+        with self.assertRaises(ZooKeeperException):
+            self.output('grep', '-r', 'host', '/missing')
+
+    def test_mirror(self):
+        self.mock_tree({
+            '/app': ['a', 'b'],
+            '/app/a': [],
+            '/app/b': [],
+        }, {'/app/a': b"any_data"})
+        self.zookeeper.get.return_value = (b"", make_stat())
+
+        self.assertEqual(self.cli.execute('mirror'), "Not mirroring")
+        self.cli.execute('mirror', '/app')
+        self.assertEqual(self.cli.execute('mirror'), "Mirroring: /app")
+
+        self.zookeeper.get.reset_mock()
+        self.zookeeper.get_async.reset_mock()
+        self.zookeeper.get_children.reset_mock()
+        self.zookeeper.get_children_async.reset_mock()
+
+        self.assertEqual(self.output('ls', '/app'), "a b\n")
+        self.assertEqual(self.output('get', '/app/a'), "any_data\n")
+        self.assertEqual(self.cli.execute('stat', '/app/a').splitlines()[3], "Data length: 8")
+        self.assertEqual(self.output('find', '/app'), "/app\n/app/a\n/app/b\n")
+
+        self.zookeeper.get.assert_not_called()
+        self.zookeeper.get_async.assert_not_called()
+        self.zookeeper.get_children.assert_not_called()
+        self.zookeeper.get_children_async.assert_not_called()
+
+        # Confirmed writes update the mirror
+        self.zookeeper.set.return_value = make_stat(8, mzxid=2, version=1)
+        self.cli.execute('set', '/app/a', 'new_data')
+        self.assertEqual(self.output('get', '/app/a'), "new_data\n")
+
+        self.cli.execute('rm', '/app/b')
+        self.assertEqual(self.output('ls', '/app'), "a\n")
+
+        # Paths outside of the mirror go to the server
+        self.zookeeper.get_async.side_effect = None
+        self.zookeeper.get_async.return_value.get.return_value = (b"other_data", make_stat())
+        self.assertEqual(self.output('get', '/other'), "other_data\n")
+
+        self.cli.execute('mirror', '--stop')
+        self.assertEqual(self.cli.execute('mirror'), "Not mirroring")
+
+    def test_watch(self):
+        self.zookeeper.exists.return_value = make_stat()
+        self.zookeeper.get_children_async.return_value.get.return_value = ([], make_stat())
+
+        output = self.cli.execute('watch', '-n', '1', '/app')
+        watch = self.zookeeper.exists.call_args[1]['watch']
+
+        self.zookeeper.exists.return_value = make_stat(version=3)
+        watch(WatchedEvent(EventType.CHANGED, KazooState.CONNECTED, '/app'))
+        self.assertRegex("".join(output), r"^[-\d]+ [:\d]+ changed /app version 0 -> 3 \(2 missed\)\n$")
+
+        with self.assertRaises(CLIException):
+            self.cli.execute('watch', '-n', 'all', '/app')
+
+    def test_stats(self):
+        self.zookeeper.get_children.return_value = ['a', 'b']
+        self.output('ls', '/')
+
+        lines = self.cli.execute('stats').splitlines()
+        self.assertEqual(lines[1].split()[:3], ['get_children', '1', '0'])
+
+        stats = json.loads(self.cli.execute('stats', '--json'))
+        self.assertEqual((stats['get_children']['count'], stats['get_children']['bytes_in']), (1, 2))
+
+        self.cli.execute('stats', '--reset')
+        self.assertEqual(json.loads(self.cli.execute('stats', '--json')), {})
+
+    def test_du(self):
+        self.mock_tree({
+            '/app': ['a', 'b'],
+            '/app/a': ['c'],
+            '/app/a/c': [],
+            '/app/b': [],
+        }, {'/app': b"12", '/app/a/c': b"1234", '/app/b': b"123"})
+
+        result = self.cli.execute('du', '/app')
+        self.assertEqual(result, "9\t4\t/app\n4\t2\t/app/a\n3\t1\t/app/b")
+
+        result = self.cli.execute('du', '-s', '/app')
+        self.assertEqual(result, "9\t4\t/app")
+
+        result = self.cli.execute('du', '-d', '2', '/app')
+        self.assertEqual(result, "9\t4\t/app\n4\t2\t/app/a\n4\t1\t/app/a/c\n3\t1\t/app/b")
+        self.zookeeper.get_async.assert_not_called()
+
+        with self.assertRaises(ZooKeeperException):
+            self.cli.execute('du', '/missing')
+
+    def test_dump(self):
+        self.mock_tree({
+            '/app': ['a'],
+            '/app/a': [],
+        }, {'/app/a': b"\x00\xffbinary"})
+
+        with self.assertRaises(MissingArgument):
+            self.cli.execute('dump', '/app')
+
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, 'app.dump')
+            self.cli.execute('dump', '/app', file)
+
+            with open(file, 'rb') as dump:
+                root, records = read_dump(dump)
+                records = list(records)
+
+        self.assertEqual(root, '/app')
+        self.assertEqual([record.path for record in records], ['/app', '/app/a'])
+        self.assertEqual(records[1].data, b"\x00\xffbinary")
+        self.assertEqual(records[1].acl, OPEN_ACL_UNSAFE)
+
+    def test_dump_missing(self):
+        self.mock_tree({'/app': []})
+
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, 'app.dump')
+            with open(file, 'wb') as dump:
+                dump.write(b"previous backup")
+
+            self.zookeeper.exists.return_value = None
+            with self.assertRaises(ZooKeeperException):
+                self.cli.execute('dump', '/missing', file)
+
+            with open(file, 'rb') as dump:
+                self.assertEqual(dump.read(), b"previous backup")
+
+            # The root disappearing after the check fails the dump as well
+            self.zookeeper.exists.return_value = make_stat()
+            with self.assertRaises(ZooKeeperException):
+                self.cli.execute('dump', '/missing', file)
+
+    def test_dump_delta(self):
+        self.mock_tree({
+            '/app': ['a', 'b', 'new'],
+            '/app/a': [],
+            '/app/b': ['x'],
+            '/app/b/x': [],
+            '/app/new': [],
+        }, {'/app/b/x': b"changed"})
+
+        base = [
+            Record('/app', b"", make_stat()._replace(pzxid=0), OPEN_ACL_UNSAFE),
+            Record('/app/a', b"", make_stat(), OPEN_ACL_UNSAFE),
+            Record('/app/b', b"", make_stat(), OPEN_ACL_UNSAFE),
+            Record('/app/b/x', b"old", make_stat(3, mzxid=0), OPEN_ACL_UNSAFE),
+            Record('/app/gone', b"", make_stat(), OPEN_ACL_UNSAFE),
+            Record('/app/gone/child', b"", make_stat(), OPEN_ACL_UNSAFE),
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            base_file = os.path.join(directory, 'app.dump')
+            with open(base_file, 'wb') as dump:
+                writer = dump_writer(dump, '/app')
+                for record in base:
+                    writer.write(record)
+
+            file = os.path.join(directory, 'app.delta')
+            self.cli.execute('dump', '--base', base_file, '/app', file)
+
+            # Unchanged nodes are only checked, not fetched or listed, and /app only gained children
+            self.assertEqual(self.zookeeper.get_async.call_args_list, [call('/app/new'), call('/app/b/x')])
+            self.assertEqual(self.zookeeper.get_children_async.call_args_list, [call('/app'), call('/app/new')])
+
+            with open(base_file, 'rb') as dump, open(file, 'rb') as delta:
+                root, nodes = read_snapshot([dump, delta])
+
+            self.assertEqual(list(nodes), ['/app', '/app/a', '/app/b', '/app/b/x', '/app/new'])
+            self.assertEqual(nodes['/app/b/x'].data, b"changed")
+
+            with self.assertRaises(ZooKeeperException):
+                self.cli.execute('load', file)
+
+            transaction = self.zookeeper.transaction.return_value
+            transaction.commit_async.return_value.get.return_value = [True]
+            self.zookeeper.exists.return_value = None
+            self.cli.execute('load', '--base', base_file, file, '/restored', '-b', '1')
+            self.assertEqual([args[0][0] for args in transaction.create.call_args_list],
+                             ['/restored', '/restored/a', '/restored/b', '/restored/b/x', '/restored/new'])
+
+            with self.assertRaises(CLIException):
+                self.cli.execute('dump', '--base', base_file, '/other', file)
+
+    def test_diff(self):
+        self.mock_tree({
+            '/staging': ['a', 'b', 'c'],
+            '/staging/a': ['x'],
+            '/staging/a/x': [],
+            '/staging/b': ['y'],
+            '/staging/b/y': [],
+            '/staging/c': [],
+            '/prod': ['a', 'b', 'd'],
+            '/prod/a': [],
+            '/prod/b': ['y'],
+            '/prod/b/y': [],
+            '/prod/d': [],
+        }, {'/staging/a': b"one", '/prod/a': b"two", '/staging/b': b"same", '/prod/b': b"same",
+            '/staging/b/y': b"short", '/prod/b/y': b"longer"})
+
+        self.assertEqual(self.output('diff', '/staging', '/prod'),
+                         "D /c\nA /d\nM /a\nD /a/x\nM /b/y\n")
+
+        # Different data lengths are told apart by stats alone
+        self.zookeeper.get_async.reset_mock()
+        self.output('diff', '/staging/b', '/prod/b')
+        self.assertEqual(self.zookeeper.get_async.call_args_list,
+                         [call('/staging/b'), call('/prod/b')])
+
+        with self.assertRaises(ZooKeeperException):
+            self.output('diff', '/staging', '/missing')
+
+        with self.assertRaises(MissingArgument):
+            self.output('diff', '/staging')
+
+        # Against a dump, nodes modified by the same transaction aren't fetched
+        records = [
+            Record('/app', b"", make_stat(), OPEN_ACL_UNSAFE),
+            Record('/app/a', b"one", make_stat(3), OPEN_ACL_UNSAFE),
+            Record('/app/a/x', b"", make_stat(), OPEN_ACL_UNSAFE),
+            Record('/app/b', b"old!", make_stat(4, mzxid=0), OPEN_ACL_UNSAFE),
+            Record('/app/gone', b"", make_stat(), OPEN_ACL_UNSAFE),
+        ]
+        self.mock_tree({
+            '/app': ['a', 'b', 'new'],
+            '/app/a': ['x'],
+            '/app/a/x': [],
+            '/app/b': [],
+            '/app/new': [],
+        }, {'/app/a': b"two", '/app/b': b"same"})
+
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, 'app.dump')
+            with open(file, 'wb') as dump:
+                writer = dump_writer(dump, '/app')
+                for record in records:
+                    writer.write(record)
+
+            self.zookeeper.get_async.reset_mock()
+            self.assertEqual(self.output('diff', '/app', file), "D /new\nA /gone\nM /b\n")
+            self.zookeeper.get_async.assert_called_once_with('/app/b')
+
+    def test_load(self):
+        records = [
+            Record('/app', b"", make_stat(), OPEN_ACL_UNSAFE),
+            Record('/app/a', b"\x00\xff", make_stat(2), OPEN_ACL_UNSAFE),
+            Record('/app/a/b', b"any_data", make_stat(8), OPEN_ACL_UNSAFE),
+            Record('/app/lock', b"", make_stat()._replace(ephemeralOwner=1), OPEN_ACL_UNSAFE),
+        ]
+
+        transaction = self.zookeeper.transaction.return_value
+        transaction.commit_async.return_value.get.return_value = [True, True]
+
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, 'app.dump')
+            with open(file, 'wb') as dump:
+                writer = dump_writer(dump, '/app')
+                for record in records:
+                    writer.write(record)
+
+            self.zookeeper.exists.return_value = None
+            self.cli.execute('load', file, '/restored', '-b', '2')
+            self.zookeeper.ensure_path.assert_called_once_with('/')
+            self.assertEqual(transaction.create.call_args_list,
+                             [call('/restored', b"", acl=None),
+                              call('/restored/a', b"\x00\xff", acl=None),
+                              call('/restored/a/b', b"any_data", acl=None)])
+
+            # Existing nodes make the batch fail and are handled one by one
+            transaction.commit_async.return_value.get.return_value = [NodeExistsError(), RolledBackError()]
+            self.zookeeper.create.side_effect = NodeExistsError
+
+            with self.assertRaises(ZooKeeperException):
+                self.cli.execute('load', file)
+
+            # An existing root fails before any batch is sent, as later ones could still succeed
+            self.zookeeper.exists.return_value = make_stat()
+            transaction.commit_async.reset_mock()
+            with self.assertRaises(ZooKeeperException):
+                self.cli.execute('load', file, '-b', '1')
+            transaction.commit_async.assert_not_called()
+
+            self.zookeeper.set.reset_mock()
+            self.cli.execute('load', file, '--mode', 'skip')
+            self.zookeeper.set.assert_not_called()
+
+            self.cli.execute('load', file, '--mode', 'overwrite', '--acl')
+            self.assertEqual(self.zookeeper.set.call_args_list,
+                             [call('/app', b""), call('/app/a', b"\x00\xff"), call('/app/a/b', b"any_data")])
+            self.assertEqual(self.zookeeper.set_acls.call_count, 3)
 
     def test_addacl(self):
         # TODO
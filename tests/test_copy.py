@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import patch
+from kazoo.security import make_digest_acl
+from climb.exceptions import CLIException
+
+from zoocli import ZooCLI
+from zoocli.exceptions import ZooKeeperException
+from zoocli.zookeeper import ZooKeeper
+
+from benchmarks.fake import FakeZooKeeper, deep_tree
+
+ACL = [make_digest_acl('admin', 'secret', all=True)]
+
+
+class CopyTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeZooKeeper()
+        deep_tree(self.client, '/app', 2, 3, data_size=4)
+        self.client.set_acls('/app/n1', ACL)
+
+        self.zookeeper_patcher = patch('zoocli.zookeeper.KazooClient', lambda hosts: self.client)
+        self.zookeeper_patcher.start()
+
+        self.cli = ZooCLI()
+        self.cli._verbose = False
+
+    def tearDown(self):
+        self.zookeeper_patcher.stop()
+
+    def paths(self, root):
+        return sorted(node for node, _, _, _ in self.cli.commands.zookeeper.walk(root))
+
+    def test_cp(self):
+        self.cli.execute('cp', '/app/n0', '/copy')
+        self.assertEqual(self.client.get('/copy')[0], b"xxxx")
+        self.assertEqual(self.client.get_children('/copy'), [])
+
+        self.cli.execute('cp', '-r', '-a', '-b', '2', '/app', '/backup/app')
+        self.assertEqual([path.replace('/backup', '') for path in self.paths('/backup/app')], self.paths('/app'))
+        self.assertEqual(self.client.get_acls('/backup/app/n1')[0], ACL)
+        self.assertEqual(self.client.get('/backup/app/n2/n0')[0], b"xxxx")
+
+        with self.assertRaises(ZooKeeperException):
+            self.cli.execute('cp', '-r', '/app', '/backup/app')
+
+        self.client.set('/app/n2/n0', b"new")
+        self.cli.execute('cp', '-r', '-m', 'overwrite', '/app', '/backup/app')
+        self.assertEqual(self.client.get('/backup/app/n2/n0')[0], b"new")
+
+        with self.assertRaises(CLIException):
+            self.cli.execute('cp', '-r', '/app', '/app/n0/copy')
+        with self.assertRaises(ZooKeeperException):
+            self.cli.execute('cp', '/missing', '/copy2')
+
+    def test_mv(self):
+        paths = self.paths('/app')
+        self.cli.execute('mv', '-j', '2', '-b', '4', '/app', '/moved')
+
+        self.assertIsNone(self.client.exists('/app'))
+        self.assertEqual([path.replace('/moved', '/app') for path in self.paths('/moved')], paths)
+        self.assertEqual(self.client.requests['transaction'], 2 * 4)
+
+    def test_mv_ephemeral(self):
+        self.client.create('/app/n0/lock', ephemeral=True)
+        with self.assertRaises(ZooKeeperException) as context:
+            self.cli.execute('mv', '/app', '/moved')
+        self.assertIn("Moved 11 of 13 nodes, kept 3", str(context.exception))
+
+        # The ephemeral node isn't copied, it stays at the source with its parents
+        self.assertEqual(self.paths('/app'), ['/app', '/app/n0', '/app/n0/lock'])
+        self.assertEqual(len(self.paths('/moved')), 13)
+
+    def test_mv_conflict(self):
+        zookeeper = ZooKeeper('hosts')
+
+        # Another client writes while the copy is in progress
+        def progress(created, updated, skipped):
+            if created == 4:
+                self.client.set('/app/n1/n2', b"changed")
+                self.client.create('/app/n0/n0/new')
+
+        with self.assertRaises(ZooKeeperException) as context:
+            zookeeper.move_tree('/app', '/moved', batch_size=2, progress=progress)
+        self.assertIn("kept 5 at the source", str(context.exception))
+
+        # Changed nodes, and their parents, stay at the source
+        self.assertEqual(self.paths('/app'), ['/app', '/app/n0', '/app/n0/n0', '/app/n0/n0/new', '/app/n1',
+                                              '/app/n1/n2'])
+        self.assertEqual(self.client.get('/moved/n1/n2')[0], b"xxxx")
+
+
+if __name__ == "__main__":
+    unittest.main()
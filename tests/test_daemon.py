@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from climb.config import config
+
+from zoocli import ZooCLI
+from zoocli.daemon import DaemonServer, send_request, socket_path, is_endless
+
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.zookeeper_patcher = patch('zoocli.zookeeper.KazooClient')
+        self.zookeeper = self.zookeeper_patcher.start()
+        self.zookeeper.return_value = self.zookeeper
+
+        self.cli = ZooCLI()
+        self.cli._verbose = False
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'zoocli.sock')
+        self.server = DaemonServer(self.cli, self.path, idle_timeout=0.2)
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.start()
+
+    def tearDown(self):
+        self.thread.join()
+        self.directory.cleanup()
+        self.zookeeper_patcher.stop()
+
+    def send(self, request):
+        output = io.BytesIO()
+        status = send_request(self.path, dict(request, cwd=os.getcwd()), output)
+        return status, output.getvalue()
+
+    def test_requests(self):
+        self.zookeeper.get_async.return_value.get.return_value = (b"any_data", None)
+
+        status, output = self.send({'command': ['get', '/any_node']})
+        self.assertEqual((status, output), (0, b"any_data\n"))
+
+        status, output = self.send({'command': ['cd', 'any_node']})
+        self.assertEqual(status, 0)
+
+        # Every request starts at the root path
+        status, output = self.send({'script': ["get x\n", "unknown\n"], 'keep_going': False, 'jobs': 2})
+        self.assertEqual(status, 1)
+        self.assertTrue(output.startswith(b"any_data\nLine 2: "))
+        self.zookeeper.get_async.assert_called_with('/x')
+
+        # Only one session for all requests
+        self.assertEqual(self.zookeeper.start.call_count, 1)
+
+    def test_cluster_reset(self):
+        config.read_dict({'cluster:prod': {'hosts': 'prod1:2181'}})
+        self.addCleanup(config.remove_section, 'cluster:prod')
+
+        status, output = self.send({'script': ["connect prod\n", "cd /config\n"], 'keep_going': False, 'jobs': 1})
+        self.assertEqual(status, 0)
+
+        # Later requests don't run against the cluster a previous one connected to
+        status, output = self.send({'command': ['connect']})
+        self.assertTrue(output.startswith(b"* default\t"))
+        self.assertEqual(self.cli.current_path, '/')
+        self.assertEqual(self.cli.commands._paths, {})
+
+    def test_other_owner(self):
+        # Another user could have created the socket to read the commands
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(OSError):
+                self.send({'command': ['get', '/any_node']})
+        self.zookeeper.get_async.assert_not_called()
+
+    def test_idle_timeout(self):
+        self.thread.join()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(send_request(self.path, {'command': ['ls']}))
+
+    def test_is_endless(self):
+        self.assertTrue(is_endless({'command': ['watch', '-r', '/app']}))
+        self.assertTrue(is_endless({'command': ['ensemble', '--watch=1']}))
+        self.assertTrue(is_endless({'script': ["ls /\n", "ensemble -w 2\n"]}))
+        self.assertFalse(is_endless({'command': ['ensemble']}))
+        self.assertFalse(is_endless({'script': ["get /watch\n", "'unclosed\n"]}))
+
+    def test_socket_path(self):
+        self.assertEqual(socket_path('zk1:2181'), socket_path('zk1:2181'))
+        self.assertNotEqual(socket_path('zk1:2181'), socket_path('zk2:2181'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+import io
+import unittest
+from kazoo.protocol.states import ZnodeStat
+from kazoo.security import ACL, Id, OPEN_ACL_UNSAFE
+
+from zoocli.dump import Record, Deletion, dump_writer, read_dump, read_snapshot
+from zoocli.exceptions import ZooKeeperException
+
+STAT = ZnodeStat(czxid=1, mzxid=2, ctime=3, mtime=4, version=5, cversion=6, aversion=7,
+                 ephemeralOwner=8, dataLength=9, numChildren=10, pzxid=11)
+
+RECORDS = [
+    Record('/app', None, STAT, OPEN_ACL_UNSAFE),
+    Record('/app/ü', b"\x00\xff\x80binary", STAT, [ACL(31, Id('digest', 'user:hash'))]),
+    Record('/app/empty', b"", STAT, []),
+]
+
+
+class DumpTest(unittest.TestCase):
+    def roundtrip(self, json_lines):
+        file = io.BytesIO()
+        writer = dump_writer(file, '/app', json_lines)
+        for record in RECORDS:
+            writer.write(record)
+
+        file.seek(0)
+        root, records = read_dump(file)
+        self.assertEqual(root, '/app')
+        self.assertEqual(list(records), RECORDS)
+
+    def test_binary(self):
+        self.roundtrip(json_lines=False)
+
+    def test_json(self):
+        self.roundtrip(json_lines=True)
+
+    def test_delta(self):
+        for json_lines in (False, True):
+            base = io.BytesIO()
+            writer = dump_writer(base, '/app', json_lines)
+            for record in RECORDS:
+                writer.write(record)
+
+            changes = [
+                Deletion('/app'),
+                Record('/app', b"new", STAT, []),
+                Record('/app/new', None, STAT, []),
+            ]
+            delta = io.BytesIO()
+            writer = dump_writer(delta, '/app', json_lines, delta=True)
+            for record in changes:
+                writer.write(record)
+
+            delta.seek(0)
+            with self.assertRaises(ZooKeeperException):
+                read_dump(delta)
+
+            base.seek(0)
+            delta.seek(0)
+            root, nodes = read_snapshot([base, delta])
+            self.assertEqual(root, '/app')
+            self.assertEqual(list(nodes.values()), changes[1:])
+
+            base.seek(0)
+            delta.seek(0)
+            root, nodes = read_snapshot([base, delta], stats_only=True)
+            self.assertEqual(nodes['/app'], Record('/app', None, STAT, None))
+
+            # Deltas have to follow a full dump
+            with self.assertRaises(ZooKeeperException):
+                read_snapshot([io.BytesIO(base.getvalue()), io.BytesIO(base.getvalue())])
+
+            with self.assertRaises(ZooKeeperException):
+                read_snapshot([io.BytesIO(delta.getvalue())])
+
+    def test_delta_subtree(self):
+        paths = ['/app', '/app/a', '/app/a/x', '/app/a/x/y', '/app/ab', '/app/b']
+        base = io.BytesIO()
+        writer = dump_writer(base, '/app')
+        for path in paths:
+            writer.write(Record(path, b"", STAT, []))
+
+        delta = io.BytesIO()
+        writer = dump_writer(delta, '/app', delta=True)
+        for record in (Deletion('/app/a'), Record('/app/a', b"new", STAT, []), Deletion('/app/b')):
+            writer.write(record)
+
+        base.seek(0)
+        delta.seek(0)
+        root, nodes = read_snapshot([base, delta])
+        # Only the subtree goes, not siblings sharing the prefix, and a re-created node has no old children
+        self.assertEqual(list(nodes), ['/app', '/app/ab', '/app/a'])
+
+    def test_invalid(self):
+        with self.assertRaises(ZooKeeperException):
+            read_dump(io.BytesIO(b"not a dump"))
+
+
+if __name__ == "__main__":
+    unittest.main()
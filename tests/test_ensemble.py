@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+import socket
+import threading
+import unittest
+import socketserver
+from unittest.mock import patch
+from climb.config import config
+from climb.exceptions import CLIException
+
+from zoocli import ZooCLI
+from zoocli.ensemble import parse_hosts, poll, format_table
+
+SRVR = """Zookeeper version: 3.6.3--6401e4ad2087061bc6b9f80dec2d69f2e3c8660a, built on 04/08/2021 16:35 GMT
+Latency min/avg/max: 0/1.5/12
+Received: 100
+Sent: 99
+Connections: 2
+Outstanding: 3
+Zxid: 0x100000010
+Mode: {mode}
+Node count: 42
+"""
+
+MNTR = """zk_version\t3.6.3
+zk_avg_latency\t1.5
+zk_outstanding_requests\t3
+zk_znode_count\t42
+zk_watch_count\t7
+zk_num_alive_connections\t2
+"""
+
+CONS = """ /127.0.0.1:50000[1](queued=0,recved=10,sent=10)
+ /127.0.0.1:50001[0](queued=0,recved=1,sent=0)
+
+"""
+
+
+class FakeServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Answers four letter words like ZooKeeper, leaving out the ones not whitelisted."""
+
+    daemon_threads = True
+
+    def __init__(self, mode, whitelist=('srvr', 'mntr', 'cons')):
+        super().__init__(('127.0.0.1', 0), FourLetterWordHandler)
+        self.mode = mode
+        self.whitelist = whitelist
+
+    @property
+    def address(self):
+        return "{}:{}".format(*self.server_address)
+
+
+class FourLetterWordHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        command = self.request.recv(4).decode('ascii')
+        if command not in self.server.whitelist:
+            answer = "{} is not executed because it is not in the whitelist.\n".format(command)
+        else:
+            answer = {'srvr': SRVR.format(mode=self.server.mode), 'mntr': MNTR, 'cons': CONS}[command]
+        self.request.sendall(answer.encode('ascii'))
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class EnsembleTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = [FakeServer('leader'), FakeServer('follower', whitelist=('srvr',))]
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def test_parse_hosts(self):
+        self.assertEqual(parse_hosts("zk1:2182, zk2,[::1]:2183/chroot"),
+                         [('zk1', 2182), ('zk2', 2181), ('::1', 2183)])
+
+    def test_poll(self):
+        port = closed_port()
+        leader, follower, missing = poll(parse_hosts(",".join(server.address for server in self.servers)
+                                                     + ",127.0.0.1:{}".format(port)), timeout=1)
+
+        self.assertEqual(leader.host, self.servers[0].address)
+        self.assertEqual((leader.role, leader.latency, leader.outstanding, leader.znodes, leader.watches,
+                          leader.connections, leader.error), ('leader', '0/1.5/12', '3', '42', '7', '2', None))
+
+        # Only srvr is whitelisted
+        self.assertEqual((follower.role, follower.znodes, follower.watches, follower.connections),
+                         ('follower', '42', None, None))
+
+        self.assertIsNone(missing.role)
+        self.assertIsNotNone(missing.error)
+
+        lines = format_table([leader, follower, missing]).splitlines()
+        self.assertEqual(lines[1].split(), ['role', 'leader', 'follower', '-'])
+        self.assertEqual(lines[5].split(), ['watches', '7', '-', '-'])
+        self.assertTrue(lines[-1].startswith('error'))
+
+    def test_command(self):
+        cli = ZooCLI()
+        cli._verbose = False
+        hosts = ",".join(server.address for server in self.servers)
+
+        with patch.dict(config['zookeeper'], {'hosts': hosts}):
+            lines = cli.execute('ensemble').splitlines()
+            self.assertEqual(lines[0].split(), ['server'] + [server.address for server in self.servers])
+            self.assertEqual(lines[4].split(), ['znodes', '42', '42'])
+
+            output = cli.execute('ensemble', '--watch', '0.01')
+            self.assertIn("role", next(output))
+            self.assertIn("leader", next(output))
+
+            with self.assertRaises(CLIException):
+                cli.execute('ensemble', '--timeout', '0')
+
+        # No connection to ZooKeeper itself is needed
+        self.assertIsNone(cli.commands.clusters.connected('default'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import MagicMock
+from kazoo.exceptions import NoNodeError
+
+from zoocli.metrics import Metrics, Instrumented, format_stats
+
+
+class FakeResult(object):
+    """Async result that is already set, calling rawlink callbacks right away."""
+
+    def __init__(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+
+    def rawlink(self, callback):
+        callback(self)
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.client = MagicMock()
+        self.instrumented = Instrumented(self.client, self.metrics)
+
+    def test_record(self):
+        self.metrics.record('get', 0.0003, 10, 100)
+        self.metrics.record('get', 0.003, 10, 100)
+        self.metrics.record('get', 10, 10, error=True)
+
+        stats = self.metrics.snapshot()['get']
+        self.assertEqual((stats.count, stats.errors, stats.bytes_out, stats.bytes_in), (3, 1, 30, 200))
+        self.assertEqual(stats.percentile(0.3), 0.5)
+        self.assertEqual(stats.percentile(0.5), 5)
+        self.assertIsNone(stats.percentile(0.99))
+
+        before = self.metrics.snapshot()
+        self.metrics.record('exists', 0.001)
+        self.assertEqual(list(self.metrics.since(before)), ['exists'])
+
+        lines = format_stats(self.metrics.snapshot()).splitlines()
+        self.assertEqual([line.split()[:2] for line in lines[1:]], [['exists', '1'], ['get', '3'], ['total', '4']])
+
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot(), {})
+
+    def test_sync(self):
+        self.client.get.return_value = (b"data", None)
+        self.assertEqual(self.instrumented.get('/node'), (b"data", None))
+        self.client.get.assert_called_once_with('/node')
+
+        self.client.set.side_effect = NoNodeError
+        with self.assertRaises(NoNodeError):
+            self.instrumented.set('/node', b"new")
+
+        stats = self.metrics.snapshot()
+        self.assertEqual((stats['get'].count, stats['get'].bytes_out, stats['get'].bytes_in), (1, 5, 4))
+        self.assertEqual((stats['set'].errors, stats['set'].bytes_out), (1, 8))
+
+        # Anything else is passed through
+        self.assertIs(self.instrumented.add_listener, self.client.add_listener)
+
+    def test_async(self):
+        self.client.get_children_async.return_value = FakeResult((['a', 'bc'], None))
+        self.client.exists_async.return_value = FakeResult(exception=NoNodeError())
+
+        self.instrumented.get_children_async('/node', include_data=True)
+        self.instrumented.exists_async('/node')
+
+        stats = self.metrics.snapshot()
+        self.assertEqual((stats['get_children'].count, stats['get_children'].bytes_in), (1, 3))
+        self.assertEqual(stats['exists'].errors, 1)
+
+    def test_transaction(self):
+        transaction = self.client.transaction.return_value
+        transaction.operations = [MagicMock(path='/a', data=b"12")]
+        transaction.commit_async.return_value = FakeResult([True])
+
+        self.instrumented.transaction().commit_async()
+        transaction.commit_async.assert_called_once_with()
+
+        stats = self.metrics.snapshot()['transaction']
+        self.assertEqual((stats.count, stats.errors, stats.bytes_out), (1, 0, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
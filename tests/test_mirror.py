@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import MagicMock
+from kazoo.exceptions import NoNodeError
+from kazoo.protocol.states import EventType, KazooState, WatchedEvent, ZnodeStat
+
+from zoocli.mirror import Mirror
+
+
+def make_stat(mzxid=1):
+    return ZnodeStat(czxid=1, mzxid=mzxid, ctime=0, mtime=0, version=0, cversion=0,
+                     aversion=0, ephemeralOwner=0, dataLength=0, numChildren=0, pzxid=1)
+
+
+class FakeClient(object):
+    def __init__(self, tree, data):
+        self.tree = tree
+        self.data = data
+
+    def get(self, path, watch=None):
+        if path not in self.tree:
+            raise NoNodeError
+        return self.data.get(path, b""), make_stat(len(self.data))
+
+    def get_children(self, path, watch=None):
+        if path not in self.tree:
+            raise NoNodeError
+        return list(self.tree[path])
+
+    def get_async(self, path, watch=None):
+        return self._async(self.get, path)
+
+    def get_children_async(self, path, watch=None):
+        return self._async(self.get_children, path)
+
+    def _async(self, method, path):
+        result = MagicMock()
+        try:
+            result.get.return_value = method(path)
+        except NoNodeError as exc:
+            result.get.side_effect = exc
+        return result
+
+
+class MirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient({'/app': ['a'], '/app/a': []}, {'/app/a': b"any_data"})
+        self.mirror = Mirror(self.client, '/app', inflight=2)
+        self.mirror.start()
+
+    def tearDown(self):
+        self.mirror.stop()
+
+    def event(self, type, path):
+        self.mirror._handle(WatchedEvent(type, KazooState.CONNECTED, path))
+
+    def test_load(self):
+        self.assertEqual(len(self.mirror), 2)
+        self.assertEqual(self.mirror.get('/app').children, ['a'])
+        self.assertEqual(self.mirror.get('/app/a').data, b"any_data")
+        self.assertTrue(self.mirror.covers('/app/a'))
+        self.assertFalse(self.mirror.covers('/application'))
+
+    def test_data_changed(self):
+        self.client.data['/app/a'] = b"new_data"
+        self.event(EventType.CHANGED, '/app/a')
+        self.assertEqual(self.mirror.get('/app/a').data, b"new_data")
+
+    def test_children_changed(self):
+        self.client.tree['/app'] = ['b']
+        self.client.tree['/app/b'] = ['c']
+        self.client.tree['/app/b/c'] = []
+        del self.client.tree['/app/a']
+
+        self.event(EventType.CHILD, '/app')
+        self.assertEqual(self.mirror.get('/app').children, ['b'])
+        self.assertIsNone(self.mirror.get('/app/a'))
+        self.assertEqual(self.mirror.get('/app/b').children, ['c'])
+        self.assertIsNotNone(self.mirror.get('/app/b/c'))
+
+    def test_deleted(self):
+        self.event(EventType.DELETED, '/app/a')
+        self.assertIsNone(self.mirror.get('/app/a'))
+        self.assertEqual(self.mirror.get('/app').children, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
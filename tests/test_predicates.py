@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+import unittest
+from kazoo.protocol.states import ZnodeStat
+
+from zoocli.predicates import DAY, stat_predicates
+
+NOW = 1000 * DAY
+
+
+def make_stat(**fields):
+    stat = dict(czxid=1, mzxid=1, ctime=0, mtime=0, version=0, cversion=0, aversion=0,
+                ephemeralOwner=0, dataLength=0, numChildren=0, pzxid=1)
+    stat.update(fields)
+    return ZnodeStat(**stat)
+
+
+class PredicatesTest(unittest.TestCase):
+    def matches(self, stat, **options):
+        return all(predicate(stat) for predicate in stat_predicates(now=NOW, **options))
+
+    def test_no_predicates(self):
+        self.assertEqual(stat_predicates(), [])
+
+    def test_comparisons(self):
+        stat = make_stat(dataLength=100)
+        self.assertTrue(self.matches(stat, size='100'))
+        self.assertTrue(self.matches(stat, size='+99'))
+        self.assertFalse(self.matches(stat, size='+100'))
+        self.assertTrue(self.matches(stat, size='-101'))
+        self.assertFalse(self.matches(stat, size='-100'))
+
+    def test_times(self):
+        # Timestamps are in milliseconds
+        stat = make_stat(ctime=(NOW - 100 * DAY) * 1000, mtime=(NOW - 90.5 * DAY) * 1000)
+        self.assertTrue(self.matches(stat, mtime='90'))
+        self.assertTrue(self.matches(stat, mtime='+89'))
+        self.assertTrue(self.matches(stat, ctime='+99', mtime='-91'))
+        self.assertFalse(self.matches(stat, ctime='-100'))
+
+    def test_ephemeral(self):
+        self.assertFalse(self.matches(make_stat(), ephemeral=True))
+        self.assertTrue(self.matches(make_stat(ephemeralOwner=255), ephemeral=True, owner='0xff'))
+        self.assertFalse(self.matches(make_stat(ephemeralOwner=255), owner='254'))
+
+
+if __name__ == "__main__":
+    unittest.main()
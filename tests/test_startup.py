@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+import os
+import sys
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StartupTest(unittest.TestCase):
+    def run_python(self, code):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        return subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                              stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+    def test_no_connection_without_command(self):
+        output = self.run_python(
+            "import sys\n"
+            "from climb.exceptions import CLIException\n"
+            "from zoocli import ZooCLI\n"
+            "cli = ZooCLI()\n"
+            "try:\n"
+            "    cli.execute('unknown')\n"
+            "except CLIException:\n"
+            "    pass\n"
+            "print(cli.execute('mirror'))\n"
+            "print('kazoo' in sys.modules, cli.commands.clusters.connected('default'))\n"
+        )
+        self.assertEqual(output.splitlines()[-1], "False None")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+import unittest
+from unittest.mock import MagicMock
+from kazoo.exceptions import NoNodeError
+from kazoo.protocol.states import EventType, KazooState, WatchedEvent, ZnodeStat
+
+from zoocli.watch import Watcher, CREATED, DELETED, CHANGED, MISSED
+
+
+def make_stat(version=0, cversion=0):
+    return ZnodeStat(czxid=1, mzxid=1, ctime=0, mtime=0, version=version, cversion=cversion,
+                     aversion=0, ephemeralOwner=0, dataLength=0, numChildren=0, pzxid=1)
+
+
+class FakeClient(object):
+    def __init__(self, tree):
+        self.tree = tree
+        self.versions = {}
+        self.cversions = {}
+        self.watched = set()
+
+    def exists(self, path, watch=None):
+        if watch is not None:
+            self.watched.add(path)
+        if path not in self.tree:
+            return None
+        return make_stat(self.versions.get(path, 0), self.cversions.get(path, 0))
+
+    def get_children(self, path, watch=None, include_data=False):
+        if path not in self.tree:
+            raise NoNodeError
+        return list(self.tree[path]), self.exists(path)
+
+    def exists_async(self, path, watch=None):
+        return self._async(lambda path: self.exists(path, watch), path)
+
+    def get_children_async(self, path, watch=None, include_data=False):
+        return self._async(self.get_children, path)
+
+    def _async(self, method, path):
+        result = MagicMock()
+        try:
+            result.get.return_value = method(path)
+        except NoNodeError as exc:
+            result.get.side_effect = exc
+        return result
+
+
+class WatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient({'/app': ['a'], '/app/a': []})
+        self.watcher = Watcher(self.client, '/app', recursive=True, inflight=2)
+        self.watcher.start()
+
+    def changes(self, type, path):
+        event = WatchedEvent(type, KazooState.CONNECTED, path)
+        return [(change.type, change.path, change.old_version, change.new_version, change.missed)
+                for change in self.watcher._handle(event, 0)]
+
+    def test_start(self):
+        self.assertEqual(len(self.watcher), 2)
+        self.assertEqual(self.client.watched, {'/app', '/app/a'})
+
+    def test_data_changed(self):
+        self.client.versions['/app/a'] = 1
+        self.assertEqual(self.changes(EventType.CHANGED, '/app/a'), [(CHANGED, '/app/a', 0, 1, 0)])
+
+        # Changes made before the watch was re-armed are counted
+        self.client.versions['/app/a'] = 4
+        self.assertEqual(self.changes(EventType.CHANGED, '/app/a'), [(CHANGED, '/app/a', 1, 4, 2)])
+
+    def test_children_changed(self):
+        self.client.tree['/app'] = ['b']
+        self.client.tree['/app/b'] = ['c']
+        self.client.tree['/app/b/c'] = []
+        self.client.cversions['/app'] = 4
+        del self.client.tree['/app/a']
+
+        self.assertEqual(self.changes(EventType.CHILD, '/app'), [
+            (DELETED, '/app/a', 0, None, 0),
+            (CREATED, '/app/b', None, 0, 0),
+            (CREATED, '/app/b/c', None, 0, 0),
+            (MISSED, '/app', None, None, 2),
+        ])
+        self.assertEqual(len(self.watcher), 3)
+
+        # Already reported through the parent's listing
+        self.assertEqual(self.changes(EventType.DELETED, '/app/a'), [])
+
+    def test_deleted(self):
+        self.client.watched.clear()
+        del self.client.tree['/app/a']
+        self.assertEqual(self.changes(EventType.DELETED, '/app/a'), [(DELETED, '/app/a', 0, None, 0)])
+        # No watch is left on the missing node, its re-creation is reported by the parent
+        self.assertEqual(self.client.watched, set())
+
+        self.client.tree['/app/a'] = []
+        self.assertEqual(self.changes(EventType.CHILD, '/app'), [(CREATED, '/app/a', None, 0, 0)])
+        self.assertEqual(self.client.watched, {'/app/a'})
+
+    def test_root_recreated(self):
+        del self.client.tree['/app']
+        del self.client.tree['/app/a']
+        self.assertEqual(self.changes(EventType.DELETED, '/app'), [(DELETED, '/app', 0, None, 0)])
+        self.assertEqual(len(self.watcher), 0)
+
+        self.client.tree['/app'] = []
+        self.assertEqual(self.changes(EventType.CREATED, '/app'), [(CREATED, '/app', None, 0, 0)])
+
+    def test_changes(self):
+        changes = self.watcher.changes()
+
+        self.client.versions['/app'] = 1
+        self.watcher._data_changed(WatchedEvent(EventType.CHANGED, KazooState.CONNECTED, '/app'))
+        self.assertEqual(next(changes).type, CHANGED)
+
+        self.watcher.stop()
+        self.assertEqual(list(changes), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
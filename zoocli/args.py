@@ -7,13 +7,27 @@ class ZooArgs(Args):
     def _load_commands(self):
         ls = self._add_command("ls", "list resources")
         ls.add_argument("-l", action="store_true", help="long listing", dest="long")
+        ls.add_argument("--no-sort", action="store_false", help="keep server's order", dest="sort")
+        ls.add_argument("-c", action="store_true", help="show children count only", dest="count")
+        ls.add_argument("--head", default=None, help="first N children, by sequence number", dest="head")
+        ls.add_argument("--tail", default=None, help="last N children, by sequence number", dest="tail")
+        ls.add_argument("--range", default=None, help="children with sequence numbers in start:end", dest="range")
+        ls.add_argument("-f", "--force", action="store_true", help="list even more children than ls_limit",
+                        dest="force")
         ls.add_argument("path", nargs="?", default=None,  help="node path (defaults to current)")
 
         cd = self._add_command("cd", "change current path")
         cd.add_argument("path", nargs="?", default=None,  help="node path (defaults to /)")
 
+        connect = self._add_command("connect", "switch to another configured cluster, keeping sessions open")
+        connect.add_argument("cluster", nargs="?", default=None, help="cluster name (lists clusters if omitted)")
+
         get = self._add_command("get", "get node's data")
-        get.add_argument("path", nargs="?", default=None,  help="node path (defaults to current")
+        get.add_argument("paths", nargs="*", default=None, help="node paths or patterns (defaults to current)")
+        get.add_argument("-r", "--raw", action="store_true", help="write raw bytes", dest="raw")
+        get.add_argument("-x", "--hex", action="store_true", help="write data in hex", dest="hex")
+        get.add_argument("-p", "--prefix", action="store_true", help="prefix data with node path", dest="prefix")
+        get.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
 
         set = self._add_command("set", "set node's data")
         set.add_argument("path", nargs="?", default=None,  help="node path")
@@ -32,11 +46,81 @@ class ZooArgs(Args):
 
         rm = self._add_command("rm", "remove node")
         rm.add_argument("-r", action="store_true", help="recursive", dest="recursive")
+        rm.add_argument("-b", "--batch", default=None, help="deletes per transaction", dest="batch_size")
+        rm.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
         rm.add_argument("path", nargs="?", default=None,  help="node path")
 
+        cp = self._add_command("cp", "copy node, also between clusters")
+        cp.add_argument("-r", action="store_true", help="copy the whole subtree", dest="recursive")
+        cp.add_argument("-m", "--mode", choices=['fail', 'skip', 'overwrite'], default='fail',
+                        help="what to do with existing nodes", dest="mode")
+        cp.add_argument("-a", "--acl", action="store_true", help="copy ACLs", dest="acl")
+        cp.add_argument("-b", "--batch", default=None, help="creates per transaction", dest="batch_size")
+        cp.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+        cp.add_argument("source", nargs="?", default=None, help="node path")
+        cp.add_argument("target", nargs="?", default=None, help="path of the copy")
+
+        mv = self._add_command("mv", "move subtree, also between clusters")
+        mv.add_argument("-a", "--acl", action="store_true", help="move ACLs", dest="acl")
+        mv.add_argument("-b", "--batch", default=None, help="operations per transaction", dest="batch_size")
+        mv.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+        mv.add_argument("source", nargs="?", default=None, help="node path")
+        mv.add_argument("target", nargs="?", default=None, help="new path")
+
+        mirror = self._add_command("mirror", "serve reads under path from a local, watched copy")
+        mirror.add_argument("path", nargs="?", default=None, help="node path (shows status if omitted)")
+        mirror.add_argument("-s", "--stop", action="store_true", help="stop mirroring", dest="stop")
+        mirror.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        watch = self._add_command("watch", "print changes of node or subtree as they happen")
+        watch.add_argument("path", nargs="?", default=None, help="node path (defaults to current)")
+        watch.add_argument("-r", action="store_true", help="watch the whole subtree", dest="recursive")
+        watch.add_argument("-n", "--events", default=None, help="exit after N changes", dest="events")
+        watch.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        stats = self._add_command("stats", "show ZooKeeper requests made in this session")
+        stats.add_argument("--json", action="store_true", help="machine-readable output", dest="json_output")
+        stats.add_argument("--reset", action="store_true", help="reset the counters", dest="reset")
+
+        ensemble = self._add_command("ensemble", "show status of all configured ZooKeeper servers")
+        ensemble.add_argument("-t", "--timeout", default=None, help="seconds to wait for each server", dest="timeout")
+        ensemble.add_argument("-w", "--watch", default=None, help="refresh every N seconds", dest="watch")
+
         stat = self._add_command("stat", "get node's details")
         stat.add_argument("path", nargs="?", default=None,  help="node path (defaults to current")
 
+        du = self._add_command("du", "show data size and node count of subtrees")
+        du.add_argument("path", nargs="?", default=None, help="node path (defaults to current)")
+        du.add_argument("-d", "--depth", default=None, help="report subtrees up to depth (defaults to 1)", dest="depth")
+        du.add_argument("-s", action="store_true", help="report total only", dest="summarize")
+        du.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        dump = self._add_command("dump", "export subtree to a file")
+        dump.add_argument("path", nargs="?", default=None, help="node path")
+        dump.add_argument("file", nargs="?", default=None, help="dump file")
+        dump.add_argument("--json", action="store_true", help="write JSON lines instead of binary records",
+                          dest="json_lines")
+        dump.add_argument("--base", action="append", default=None,
+                          help="write only changes since this dump (repeat for a full dump and its deltas)",
+                          dest="base")
+        dump.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        load = self._add_command("load", "restore subtree from a dump file")
+        load.add_argument("file", nargs="?", default=None, help="dump file")
+        load.add_argument("path", nargs="?", default=None, help="target path (defaults to dumped path)")
+        load.add_argument("-m", "--mode", choices=['fail', 'skip', 'overwrite'], default='fail',
+                          help="what to do with existing nodes", dest="mode")
+        load.add_argument("-a", "--acl", action="store_true", help="restore dumped ACLs", dest="acl")
+        load.add_argument("--base", action="append", default=None,
+                          help="dump the file is a delta of (repeat for a full dump and its deltas)", dest="base")
+        load.add_argument("-b", "--batch", default=None, help="creates per transaction", dest="batch_size")
+        load.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        diff = self._add_command("diff", "compare subtree with another one or a dump file")
+        diff.add_argument("path", nargs="?", default=None, help="node path")
+        diff.add_argument("other", nargs="?", default=None, help="node path or dump file to compare with")
+        diff.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
         getacl = self._add_command("getacl", "show node's ACL")
         getacl.add_argument("path", nargs="?", default=None,  help="node path (defaults to current")
 
@@ -45,13 +129,48 @@ class ZooArgs(Args):
         addacl.add_argument("permissions", nargs="?", default=None,  help="ACL permissions")
         addacl.add_argument("scheme", nargs="?", default=None,  help="ACL scheme")
         addacl.add_argument("id", nargs="?", default=None,  help="ACL id")
+        addacl.add_argument("-r", action="store_true", help="add to the whole subtree", dest="recursive")
+        addacl.add_argument("--audit", action="store_true", help="only list nodes without the ACL", dest="audit")
+        addacl.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
 
         rmacl = self._add_command("rmacl", "remove node's ACL")
         rmacl.add_argument("path", nargs="?", default=None,  help="node path")
-        rmacl.add_argument("index", nargs="?", default=None, help="ACL index")
+        rmacl.add_argument("index", nargs="?", default=None, help="ACL index, or scheme followed by id")
+        rmacl.add_argument("id", nargs="?", default=None, help="ACL id")
+        rmacl.add_argument("-r", action="store_true", help="remove from the whole subtree", dest="recursive")
+        rmacl.add_argument("--audit", action="store_true", help="only list nodes with the ACL", dest="audit")
+        rmacl.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        setacl = self._add_command("setacl", "replace node's ACL")
+        setacl.add_argument("path", nargs="?", default=None,  help="node path")
+        setacl.add_argument("acl", nargs="?", default=None, help="comma-separated scheme:id:permissions")
+        setacl.add_argument("-r", action="store_true", help="set on the whole subtree", dest="recursive")
+        setacl.add_argument("--audit", action="store_true", help="only list nodes with a different ACL",
+                            dest="audit")
+        setacl.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+
+        grep = self._add_command("grep", "search nodes' data")
+        grep.add_argument("pattern", nargs="?", default=None, help="regular expression")
+        grep.add_argument("path", nargs="?", default=None, help="node path (defaults to current)")
+        grep.add_argument("-r", action="store_true", help="search the whole subtree", dest="recursive")
+        grep.add_argument("-l", action="store_true", help="show matching paths only", dest="files")
+        grep.add_argument("-c", action="store_true", help="show count of matching lines", dest="count")
+        grep.add_argument("-i", action="store_true", help="ignore case", dest="ignore_case")
+        grep.add_argument("--max-size", default=None, help="skip nodes with more bytes of data", dest="max_size")
+        grep.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
 
         find = self._add_command("find", "find all sub-nodes")
         find.add_argument("path", nargs="?", default=None,  help="node path")
         find.add_argument("-name", nargs="?", default=None, help="name pattern", dest="name_filter")
         find.add_argument("-mindepth", nargs="?", default=None, help="min depth")
         find.add_argument("-maxdepth", nargs="?", default=None, help="max depth")
+        find.add_argument("-j", "--inflight", default=None, help="max concurrent requests", dest="inflight")
+        find.add_argument("-print0", action="store_true", help="separate paths with null characters", dest="print0")
+        find.add_argument("--no-sort", action="store_false", help="keep server's order of children", dest="sort")
+        find.add_argument("-ephemeral", action="store_true", help="ephemeral nodes only", dest="ephemeral")
+        find.add_argument("-owner", default=None, help="ephemeral owner's session id", dest="owner")
+        find.add_argument("-size", default=None, help="data length in bytes ([+-]N)", dest="size")
+        find.add_argument("-mtime", default=None, help="days since last modification ([+-]N)", dest="mtime")
+        find.add_argument("-ctime", default=None, help="days since creation ([+-]N)", dest="ctime")
+        find.add_argument("-children", default=None, help="number of children ([+-]N)", dest="children")
+        find.add_argument("-version", default=None, help="data version ([+-]N)", dest="version")
@@ -0,0 +1,113 @@
+import sys
+import time
+import shlex
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from climb.exceptions import CLIException
+
+from zoocli.metrics import format_stats
+from zoocli.output import is_stream, write_result
+
+# Commands that only read from ZooKeeper and may run concurrently
+READ_COMMANDS = {'ls', 'get', 'stat', 'getacl', 'find', 'grep', 'du', 'diff'}
+DEFAULT_JOBS = 8
+
+
+def run_command(cli, args):
+    """Executes a single command, printing its result or error. Returns the exit status."""
+    try:
+        result = cli.execute(*args)
+        if result:
+            write_result(result)
+    except CLIException as exc:
+        print(exc)
+        return 1
+
+    return 0
+
+
+def run_script(cli, lines, keep_going=False, jobs=DEFAULT_JOBS):
+    """Executes script commands over the CLI's session, returning the exit status.
+
+    Empty lines and #-comments are skipped. Consecutive read commands are
+    executed concurrently, up to `jobs` at a time, while their results are
+    printed in script order. Any other command waits for the previous ones to
+    finish. Execution stops at the first error unless `keep_going` is set.
+
+    Streamed results of concurrent commands are collected by the worker threads,
+    so that their requests really overlap; other commands stream as usual.
+    """
+    status = 0
+    pending = []
+
+    def fail(number, exc):
+        nonlocal status
+        print("Line {}: {}".format(number, exc))
+        status = 1
+        return keep_going
+
+    def report(number, execute):
+        try:
+            result = execute()
+            if result:
+                write_result(result)
+        except CLIException as exc:
+            return fail(number, exc)
+
+        return True
+
+    def execute_collected(args):
+        result = cli.execute(*args)
+        return iter(list(result)) if is_stream(result) else result
+
+    def flush():
+        try:
+            return all(report(number, future.result) for number, future in pending)
+        finally:
+            pending.clear()
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for number, line in enumerate(lines, start=1):
+            try:
+                args = shlex.split(line, comments=True)
+            except ValueError as exc:
+                ok = flush() and fail(number, exc)
+            else:
+                if not args:
+                    continue
+
+                if args[0] in READ_COMMANDS:
+                    pending.append((number, executor.submit(execute_collected, args)))
+                    ok = len(pending) < jobs or flush()
+                else:
+                    # Previous commands have to finish first, e.g. for cd to affect only what follows
+                    ok = flush() and report(number, partial(cli.execute, *args))
+
+            if not ok:
+                return status
+
+        flush()
+
+    return status
+
+
+def run_request(cli, request):
+    """Executes a request built by the zoocli script, a command or a script. Returns the exit status.
+
+    With `timing` set, a summary of the requests made and the wall time is
+    printed to stderr afterwards.
+    """
+    metrics = cli.commands.metrics
+    before = metrics.snapshot()
+    start = time.perf_counter()
+
+    if 'script' in request:
+        status = run_script(cli, request['script'], request['keep_going'], request['jobs'])
+    else:
+        status = run_command(cli, request['command'])
+
+    if request.get('timing'):
+        print("Wall time: {:.2f} ms".format((time.perf_counter() - start) * 1000), file=sys.stderr)
+        print(format_stats(metrics.since(before)), file=sys.stderr)
+
+    return status
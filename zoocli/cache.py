@@ -0,0 +1,73 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def sizeof(path, children):
+    return sys.getsizeof(path) + sys.getsizeof(children) + sum(sys.getsizeof(child) for child in children)
+
+
+class ChildrenCache(object):
+    """LRU cache of node children lists, bounded by their approximate memory size.
+
+    Entries are invalidated from watch callbacks running in kazoo's threads,
+    so all operations are guarded by a lock. Each invalidation bumps the cache
+    generation; a list fetched before an invalidation is not stored, as it may
+    already be stale.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._size = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(path)
+            return entry[0]
+
+    def put(self, path, children, generation):
+        size = sizeof(path, children)
+        if size > self._max_size:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._discard(path)
+            self._entries[path] = (children, size)
+            self._size += size
+
+            while self._size > self._max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def invalidate(self, path):
+        with self._lock:
+            self._generation += 1
+            self._discard(path)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._size = 0
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
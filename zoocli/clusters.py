@@ -0,0 +1,71 @@
+import atexit
+import threading
+from climb.config import config
+from climb.exceptions import CLIException
+
+# Cluster configured by the [zookeeper] section
+DEFAULT_CLUSTER = 'default'
+# Other clusters are configured by [cluster:<name>] sections
+SECTION_PREFIX = 'cluster:'
+
+
+def cluster_names():
+    return [DEFAULT_CLUSTER] + [section[len(SECTION_PREFIX):] for section in config.sections()
+                                if section.startswith(SECTION_PREFIX)]
+
+
+def cluster_config(name):
+    """Returns connection settings of the cluster, as keyword arguments of ZooKeeper."""
+    if name == DEFAULT_CLUSTER:
+        return dict(config['zookeeper'])
+
+    section = SECTION_PREFIX + name
+    if not config.has_section(section):
+        raise CLIException("Unknown cluster: {}".format(name))
+
+    settings = dict(config[section])
+    # Credentials belong to a cluster, the cache limit may be shared
+    if 'cache_size' not in settings and config.has_option('zookeeper', 'cache_size'):
+        settings['cache_size'] = config['zookeeper']['cache_size']
+    return settings
+
+
+def split_cluster(path):
+    """Returns (cluster, path) of a cluster:/path address; cluster is None for plain paths.
+
+    Node names may contain colons, so only configured cluster names count.
+    """
+    if path:
+        name, separator, rest = path.partition(':')
+        if separator and '/' not in name and name in cluster_names():
+            return name, rest
+
+    return None, path
+
+
+class ClusterPool(object):
+    """Sessions of configured clusters, connected on first use and kept open to switch between them."""
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                settings = cluster_config(name)
+
+                # Importing kazoo alone takes a noticeable part of the startup time
+                from zoocli.zookeeper import ZooKeeper
+
+                session = ZooKeeper(metrics=self._metrics, **settings)
+                atexit.register(session.stop)
+                self._sessions[name] = session
+
+        return session
+
+    def connected(self, name):
+        """Returns the session of the cluster if it is connected already, None otherwise."""
+        return self._sessions.get(name)
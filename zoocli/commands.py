@@ -1,15 +1,23 @@
 import os
 import re
-import atexit
+import copy
+import json
+import glob
+import heapq
+import itertools
+import time
 import tempfile
 from climb.commands import Commands, command, completers
 from climb.exceptions import MissingArgument, CLIException
 from climb.paths import ROOT_PATH, format_path
 from climb.config import config
 
+from zoocli.clusters import ClusterPool, DEFAULT_CLUSTER, cluster_config, cluster_names, split_cluster
 from zoocli.exceptions import ZooKeeperException
-from zoocli.utils import timestamp_to_date
-from zoocli.zookeeper import ZooKeeper
+from zoocli.metrics import Metrics, format_stats
+from zoocli.output import stream_lines, stream_words
+from zoocli.predicates import stat_predicates
+from zoocli.utils import timestamp_to_date, sequence_number, sequence_key, DEFAULT_INFLIGHT, DEFAULT_BATCH_SIZE
 
 
 def using_path(required=False, default=None):
@@ -18,44 +26,265 @@ def using_path(required=False, default=None):
             if required and not path:
                 raise MissingArgument("Missing node path")
 
-            path = format_path(self._cli.current_path, path, default=default)
-            return function(self, path, **kwargs)
+            cluster, path = self.resolve(path, default)
+            return function(self.on(cluster), path, **kwargs)
 
         return inner
     return wrapper
 
 
+def filter_depth(depth):
+    if depth is None:
+        return None
+
+    try:
+        depth = int(depth)
+    except ValueError:
+        raise CLIException("Depth has to be an integer")
+
+    if depth < 0:
+        raise CLIException("Depth can't be negative")
+
+    return depth
+
+
+def filter_count(count, name):
+    if count is None:
+        return None
+
+    try:
+        count = int(count)
+    except ValueError:
+        raise CLIException("Argument of --{} has to be an integer".format(name))
+
+    if count < 0:
+        raise CLIException("Argument of --{} can't be negative".format(name))
+
+    return count
+
+
+def filter_range(range):
+    if range is None:
+        return None
+
+    try:
+        start, end = range.split(':')
+        return (int(start) if start else None, int(end) if end else None)
+    except ValueError:
+        raise CLIException("Range has to be in start:end format, with sequence numbers")
+
+
+def filter_inflight(inflight):
+    if inflight is None:
+        return DEFAULT_INFLIGHT
+
+    try:
+        inflight = int(inflight)
+    except ValueError:
+        raise CLIException("Number of requests in flight has to be an integer")
+
+    if inflight < 1:
+        raise CLIException("Number of requests in flight has to be positive")
+
+    return inflight
+
+
+def open_dumps(files):
+    """Opens dump files one at a time, as reading moves on to the next one."""
+    for file in files:
+        with open(os.path.expanduser(file), 'rb') as input:
+            yield input
+
+
+def filter_seconds(seconds, name, default=None):
+    if seconds is None:
+        return default
+
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        raise CLIException("Argument of --{} has to be a number of seconds".format(name))
+
+    if seconds <= 0:
+        raise CLIException("Argument of --{} has to be positive".format(name))
+
+    return seconds
+
+
+def filter_batch_size(batch_size):
+    if batch_size is None:
+        return DEFAULT_BATCH_SIZE
+
+    try:
+        batch_size = int(batch_size)
+    except ValueError:
+        raise CLIException("Batch size has to be an integer")
+
+    if batch_size < 1:
+        raise CLIException("Batch size has to be positive")
+
+    return batch_size
+
+
 class ZooCommands(Commands):
 
     def __init__(self, cli):
         super().__init__(cli)
 
-        self._zookeeper = ZooKeeper(**config['zookeeper'])
-        atexit.register(self._zookeeper.stop)
+        # Kept by the commands, so it can be read before connecting
+        self.metrics = Metrics()
+        self.clusters = ClusterPool(self.metrics)
+        self.cluster = DEFAULT_CLUSTER
+        # Current paths of the clusters switched away from
+        self._paths = {}
+
+    @property
+    def zookeeper(self):
+        """Connects on first use, so commands that don't need ZooKeeper start fast."""
+        return self.clusters.get(self.cluster)
+
+    def resolve(self, path, default=None):
+        """Returns (cluster, absolute path) of a path, optionally prefixed with cluster name like prod:/path.
+
+        Relative paths are relative to the current path on the current
+        cluster, and to the root on other clusters.
+        """
+        current = self._cli.commands.cluster
+        cluster, path = split_cluster(path)
+        if cluster is None or cluster == current:
+            return current, format_path(self._cli.current_path, path, default=default)
+
+        return cluster, format_path(ROOT_PATH, path, default=default or ROOT_PATH)
+
+    def on(self, cluster):
+        """Returns commands working with the cluster, sharing this one's sessions."""
+        if cluster == self.cluster:
+            return self
+
+        commands = copy.copy(self)
+        commands.cluster = cluster
+        return commands
+
+    def reset(self):
+        """Goes back to the root path of the default cluster, like a new shell."""
+        self._paths.clear()
+        self.cluster = DEFAULT_CLUSTER
+        self._cli.set_current_path(ROOT_PATH)
+
+    def switch(self, cluster, path):
+        self._paths[self.cluster] = self._cli.current_path
+        self.cluster = cluster
+        self._cli.set_current_path(path)
+
+    @command
+    @completers('cluster')
+    def connect(self, cluster=None):
+        if not cluster:
+            lines = []
+            for name in cluster_names():
+                marker = "*" if name == self.cluster else " "
+                state = "connected" if self.clusters.connected(name) else "-"
+                lines.append("{} {}\t{}\t{}".format(marker, name, state, cluster_config(name)['hosts']))
+            return "\n".join(lines)
+
+        if cluster not in cluster_names():
+            raise CLIException("Unknown cluster: {}".format(cluster))
+
+        # Connecting right away shows connection problems before the next command
+        self.clusters.get(cluster)
+        if cluster != self.cluster:
+            self.switch(cluster, self._paths.get(cluster, ROOT_PATH))
+        self._cli.log("Connected: {} ({})", cluster, cluster_config(cluster)['hosts'])
 
     @command
     @completers('path')
     @using_path()
-    def ls(self, path=None, long=False):
-        result = self._zookeeper.list(path)
+    def ls(self, path=None, long=False, sort=True, count=False, head=None, tail=None, range=None, force=False):
+        if count:
+            return str(self.zookeeper.stat(path).children_count)
+
+        head = filter_count(head, 'head')
+        tail = filter_count(tail, 'tail')
+        range = filter_range(range)
+
+        paged = head is not None or tail is not None or range is not None
+        limit = None if paged or force else config['zoocli'].getint('ls_limit', 0)
+        result = self.zookeeper.list(path, limit)
+
+        if range is not None:
+            start, end = range
+
+            def in_range(child):
+                number = sequence_number(child)
+                return (number is not None
+                        and (start is None or number >= start)
+                        and (end is None or number <= end))
+
+            result = [child for child in result if in_range(child)]
 
-        separator = "\n" if long else " "
-        return separator.join(sorted(result))
+        # Partial selections don't need the whole list sorted
+        if head is not None:
+            result = heapq.nsmallest(head, result, key=sequence_key)
+        elif tail is not None:
+            result = heapq.nlargest(tail, result, key=sequence_key)[::-1]
+        elif range is not None:
+            result = sorted(result, key=sequence_key)
+        elif sort:
+            result = sorted(result)
+
+        return stream_lines(result) if long else stream_words(result)
 
     @command
     @completers('path')
-    @using_path(default=ROOT_PATH)
     def cd(self, path=None):
+        cluster, path = self.resolve(path, default=ROOT_PATH)
+
         # No exception means correct path
-        self._zookeeper.list(path)
-        self._cli.set_current_path(path)
+        self.clusters.get(cluster).list(path)
+        if cluster != self.cluster:
+            self.switch(cluster, path)
+        else:
+            self._cli.set_current_path(path)
 
     @command
     @completers('path')
-    @using_path()
-    def get(self, path=None):
-        data = self._zookeeper.get(path)
-        return data
+    def get(self, paths=None, raw=False, hex=False, prefix=False, inflight=None):
+        inflight = filter_inflight(inflight)
+        paths = [self.resolve(path) for path in paths or [None]]
+
+        def expand(zookeeper, paths):
+            for _, path in paths:
+                if not glob.has_magic(path):
+                    yield path
+                    continue
+
+                matches = zookeeper.glob(path)
+                if not matches:
+                    raise ZooKeeperException("No such node: {}".format(path))
+                yield from matches
+
+        def fetch():
+            # Consecutive paths of the same cluster are fetched together
+            for cluster, group in itertools.groupby(paths, key=lambda item: item[0]):
+                zookeeper = self.clusters.get(cluster)
+                for path, data in zookeeper.get_many(expand(zookeeper, group), inflight):
+                    yield (path if cluster == self.cluster else "{}:{}".format(cluster, path)), data
+
+        def output():
+            for path, data in fetch():
+                if prefix:
+                    yield "{}: ".format(path)
+
+                if raw:
+                    yield data
+                    if prefix:
+                        yield "\n"
+                elif hex:
+                    yield data.hex() + "\n"
+                else:
+                    yield data.decode('utf-8', errors='backslashreplace') + "\n"
+
+        return output()
 
     @command
     @completers('path')
@@ -64,14 +293,14 @@ class ZooCommands(Commands):
         if not data:
             raise MissingArgument("Missing data")
 
-        self._zookeeper.set(path, data)
+        self.zookeeper.set(path, data)
         self._cli.log("Set {} data: {}", path, data)
 
     @command
     @completers('path')
     @using_path()
     def editor(self, path):
-        data = self._zookeeper.get(path)
+        data = self.zookeeper.get(path)
 
         tmp_file = tempfile.mktemp()
 
@@ -86,7 +315,7 @@ class ZooCommands(Commands):
 
             with open(tmp_file, 'r') as file:
                 new_data = file.read().rstrip()
-                self._zookeeper.set(path, new_data)
+                self.zookeeper.set(path, new_data)
 
         os.unlink(tmp_file)
 
@@ -94,21 +323,161 @@ class ZooCommands(Commands):
     @completers('path')
     @using_path(required=True)
     def create(self, path=None, data=None, ephemeral=False, sequence=False, makepath=False):
-        self._zookeeper.create(path, data, ephemeral, sequence, makepath)
+        self.zookeeper.create(path, data, ephemeral, sequence, makepath)
         self._cli.log("Created: {}", path)
 
     @command
     @completers('path')
     @using_path(required=True)
-    def rm(self, path=None, recursive=False):
-        self._zookeeper.delete(path, recursive)
-        self._cli.log("Removed: {}", path)
+    def rm(self, path=None, recursive=False, batch_size=None, inflight=None):
+        if not recursive:
+            self.zookeeper.delete(path)
+            self._cli.log("Removed: {}", path)
+            return
+
+        def progress(deleted, total):
+            self._cli.log("Removing: {}/{}", deleted, total)
+
+        deleted = self.zookeeper.delete_tree(path,
+                                              filter_batch_size(batch_size),
+                                              filter_inflight(inflight),
+                                              progress)
+        self._cli.log("Removed: {} ({} nodes)", path, deleted)
+
+    def _transfer(self, source, target):
+        """Resolves source and target of cp and mv to (source cluster, path, target cluster, path)."""
+        if not source or not target:
+            raise MissingArgument("Missing source or target path")
+
+        source_cluster, source = self.resolve(source)
+        target_cluster, target = self.resolve(target)
+        if source_cluster == target_cluster and (target == source or target.startswith(source.rstrip('/') + '/')):
+            raise CLIException("Target is inside the source: {}".format(target))
+
+        # Fails early on missing source, before any node is created
+        self.clusters.get(source_cluster).stat(source)
+        return self.clusters.get(source_cluster), source, self.clusters.get(target_cluster), target
+
+    @command
+    @completers('path', 'path')
+    def cp(self, source=None, target=None, recursive=False, mode='fail', acl=False, batch_size=None, inflight=None):
+        zookeeper, source, destination, target = self._transfer(source, target)
+
+        def progress(created, updated, skipped):
+            self._cli.log("Copying: {} created, {} updated, {} skipped", created, updated, skipped)
+
+        created, updated, skipped = zookeeper.copy_tree(source, target, destination, recursive, mode, acl,
+                                                        filter_batch_size(batch_size), filter_inflight(inflight),
+                                                        progress, onerror=print)
+        self._cli.log("Copied: {} to {} ({} created, {} updated, {} skipped)",
+                      source, target, created, updated, skipped)
+
+    @command
+    @completers('path', 'path')
+    def mv(self, source=None, target=None, acl=False, batch_size=None, inflight=None):
+        zookeeper, source, destination, target = self._transfer(source, target)
+        if source == ROOT_PATH:
+            raise CLIException("Can't move the root node")
+
+        def progress(created, updated, skipped):
+            self._cli.log("Copying: {} created", created)
+
+        moved = zookeeper.move_tree(source, target, destination, acl,
+                                    filter_batch_size(batch_size), filter_inflight(inflight), progress)
+        self._cli.log("Moved: {} to {} ({} nodes)", source, target, moved)
+
+    @command
+    @completers('path')
+    def mirror(self, path=None, stop=False, inflight=None):
+        zookeeper = self.clusters.connected(self.cluster)
+        if stop:
+            if zookeeper:
+                zookeeper.unmirror()
+            self._cli.log("Stopped mirroring")
+            return
+
+        if not path:
+            root = zookeeper.mirror_root if zookeeper else None
+            return "Mirroring: {}".format(root) if root else "Not mirroring"
+
+        cluster, path = self.resolve(path)
+        count = self.clusters.get(cluster).mirror(path, filter_inflight(inflight))
+        self._cli.log("Mirrored: {} ({} nodes)", path, count)
+
+    @command
+    @completers('path')
+    @using_path()
+    def watch(self, path=None, recursive=False, events=None, inflight=None):
+        events = filter_count(events, 'events')
+        watcher = self.zookeeper.watch(path, recursive, filter_inflight(inflight))
+        self._cli.log("Watching: {} ({} nodes)", path, len(watcher))
+
+        from zoocli.watch import CREATED, DELETED, CHANGED, MISSED
+
+        def format(change):
+            line = "{} {} {}".format(timestamp_to_date(change.time), change.type, change.path)
+
+            if change.type == CHANGED:
+                line += " version {} -> {}".format(change.old_version, change.new_version)
+            elif change.type == CREATED and change.new_version is not None:
+                line += " version {}".format(change.new_version)
+            elif change.type == DELETED and change.old_version is not None:
+                line += " version {}".format(change.old_version)
+
+            if change.type == MISSED:
+                line += " ({} child changes)".format(change.missed)
+            elif change.missed:
+                line += " ({} missed)".format(change.missed)
+            return line
+
+        def output():
+            try:
+                for number, change in enumerate(watcher.changes(), start=1):
+                    yield format(change) + "\n"
+                    if events is not None and number >= events:
+                        return
+            finally:
+                watcher.stop()
+
+        return output()
+
+    @command
+    def stats(self, json_output=False, reset=False):
+        if reset:
+            self.metrics.reset()
+            self._cli.log("Reset session stats")
+            return
+
+        operations = self.metrics.snapshot()
+        if json_output:
+            return json.dumps({operation: stats.to_dict() for operation, stats in operations.items()},
+                              sort_keys=True)
+
+        return format_stats(operations)
+
+    @command
+    def ensemble(self, timeout=None, watch=None):
+        from zoocli.ensemble import parse_hosts, poll, format_table, DEFAULT_TIMEOUT
+
+        hosts = parse_hosts(cluster_config(self.cluster)['hosts'])
+        timeout = filter_seconds(timeout, 'timeout', DEFAULT_TIMEOUT)
+        interval = filter_seconds(watch, 'watch')
+
+        if interval is None:
+            return format_table(poll(hosts, timeout))
+
+        def output():
+            while True:
+                yield "{}\n{}\n\n".format(timestamp_to_date(time.time()), format_table(poll(hosts, timeout)))
+                time.sleep(interval)
+
+        return output()
 
     @command
     @completers('path')
     @using_path()
     def stat(self, path=None):
-        stat = self._zookeeper.stat(path)
+        stat = self.zookeeper.stat(path)
 
         lines = ["Created: {created} by session id: {created_id}",
                  "Modified: {modified} by session id: {modified_id}",
@@ -134,11 +503,124 @@ class ZooCommands(Commands):
             pzxid=stat.pzxid,
         )
 
+    @command
+    @completers('path')
+    @using_path()
+    def du(self, path=None, depth=None, summarize=False, inflight=None):
+        depth = 0 if summarize else filter_depth(depth)
+        if depth is None:
+            depth = 1
+
+        usage = self.zookeeper.usage(path, depth, filter_inflight(inflight), onerror=print)
+
+        lines = ["{}\t{}\t{}".format(size, nodes, node)
+                 for node, (size, nodes) in sorted(usage.items(), key=lambda item: (-item[1][0], item[0]))]
+        return "\n".join(lines)
+
+    @command
+    @completers('path', 'system_path')
+    @using_path(required=True)
+    def dump(self, path=None, file=None, json_lines=False, base=None, inflight=None):
+        if not file:
+            raise MissingArgument("Missing dump file")
+
+        inflight = filter_inflight(inflight)
+
+        count = 0
+        deleted = 0
+        from zoocli.dump import dump_writer, read_snapshot, Deletion
+
+        # Fails before the output is opened, so an existing dump isn't truncated
+        self.zookeeper.stat(path)
+
+        if base:
+            # Read before the output is opened, it may overwrite one of the base files
+            root, nodes = read_snapshot(open_dumps(base), stats_only=True)
+            if root != path:
+                raise CLIException("Base dumps are of {}, not {}".format(root, path))
+
+        with open(os.path.expanduser(file), 'wb') as output:
+            writer = dump_writer(output, path, json_lines, delta=bool(base))
+            if base:
+                records = self.zookeeper.read_tree_delta(path, nodes, inflight, onerror=print)
+            else:
+                records = self.zookeeper.read_tree(path, inflight, onerror=print)
+
+            for record in records:
+                writer.write(record)
+                if isinstance(record, Deletion):
+                    deleted += 1
+                else:
+                    count += 1
+
+        if base:
+            self._cli.log("Dumped delta: {} ({} changed, {} deleted) to {}", path, count, deleted, file)
+        else:
+            self._cli.log("Dumped: {} ({} nodes) to {}", path, count, file)
+
+    @command
+    @completers('system_path', 'path')
+    def load(self, file=None, path=None, mode='fail', acl=False, base=None, batch_size=None, inflight=None):
+        if not file:
+            raise MissingArgument("Missing dump file")
+
+        cluster = self.cluster
+        if path:
+            cluster, path = self.resolve(path)
+        zookeeper = self.clusters.get(cluster)
+
+        batch_size = filter_batch_size(batch_size)
+        inflight = filter_inflight(inflight)
+
+        def progress(created, updated, skipped):
+            self._cli.log("Loading: {} created, {} updated, {} skipped", created, updated, skipped)
+
+        from zoocli.dump import read_dump, read_snapshot
+
+        if base:
+            root, nodes = read_snapshot(open_dumps(base + [file]))
+            created, updated, skipped = zookeeper.load_tree(nodes.values(), root, path, mode, acl,
+                                                             batch_size, inflight, progress)
+        else:
+            with open(os.path.expanduser(file), 'rb') as input:
+                root, records = read_dump(input)
+                created, updated, skipped = zookeeper.load_tree(records, root, path, mode, acl,
+                                                                 batch_size, inflight, progress)
+
+        self._cli.log("Loaded: {} ({} created, {} updated, {} skipped)",
+                      path or root, created, updated, skipped)
+
+    @command
+    @completers('path', 'system_path')
+    @using_path(required=True)
+    def diff(self, path=None, other=None, inflight=None):
+        if not other:
+            raise MissingArgument("Missing path or dump file to compare with")
+
+        inflight = filter_inflight(inflight)
+        file = os.path.expanduser(other)
+
+        def changes():
+            if not os.path.isfile(file):
+                # The other subtree may be on another cluster, streamed from its own session
+                cluster, other_path = self.resolve(other)
+                yield from self.zookeeper.diff(path, other_path, inflight=inflight, onerror=print,
+                                               other_cluster=self.clusters.get(cluster))
+                return
+
+            from zoocli.dump import read_dump
+
+            with open(file, 'rb') as input:
+                root, records = read_dump(input)
+                yield from self.zookeeper.diff(path, root, records, inflight, onerror=print)
+
+        return stream_lines("{} /{}".format(change, relative) for change, relative in changes())
+
     @command
     @completers('path')
     @using_path()
     def getacl(self, path=None):
-        current_acl = self._zookeeper.get_acl(path)
+        current_acl = self.zookeeper.get_acl(path)
 
         lines = []
         for i, acl in enumerate(current_acl):
@@ -149,76 +631,164 @@ class ZooCommands(Commands):
 
         return "\n".join(lines)
 
-    @command
-    @completers('path')
-    @using_path(required=True)
-    def addacl(self, permissions=None, path=None, scheme=None, id=None):
-        self._zookeeper.add_acl(path, permissions, scheme, id)
+    def _audit_acls(self, path, change, recursive, inflight):
+        from zoocli.zookeeper import format_acl
 
-        self._cli.log("Added ACL to {}: {}:{} ({})", path, scheme, id, permissions)
+        nodes = self.zookeeper.audit_acls(path, change, recursive, filter_inflight(inflight), onerror=print)
+        return stream_lines("{}: {}".format(node, format_acl(acl)) for node, acl, _, _ in nodes)
+
+    def _update_acls(self, path, change, recursive, inflight):
+        if recursive:
+            return self.zookeeper.update_acls(path, change, True, filter_inflight(inflight), onerror=print)
+        return int(self.zookeeper.change_acl(path, change))
 
     @command
     @completers('path')
     @using_path(required=True)
-    def rmacl(self, path=None, index=None):
-        index = int(index)
+    def addacl(self, path=None, permissions=None, scheme=None, id=None, recursive=False, audit=False,
+               inflight=None):
+        if not permissions or not scheme or not id:
+            raise MissingArgument("Missing ACL permissions, scheme or id")
+
+        from zoocli.zookeeper import adding_acl, make_acl_entry
 
-        deleted = self._zookeeper.delete_acl(path, index)
+        change = adding_acl(make_acl_entry(permissions, scheme, id))
+        if audit:
+            return self._audit_acls(path, change, recursive, inflight)
 
-        self._cli.log("Deleted ACL from {}: {} {}", path, deleted.id.scheme, deleted.id.id)
+        updated = self._update_acls(path, change, recursive, inflight)
+        self._cli.log("Added ACL to {} ({} nodes changed): {}:{} ({})", path, updated, scheme, id, permissions)
 
     @command
     @completers('path')
-    @using_path()
-    def find(self, path=None, name_filter=None, mindepth=None, maxdepth=None):
-        def filter_depth(depth):
-            if depth is None:
-                return None
+    @using_path(required=True)
+    def rmacl(self, path=None, index=None, id=None, recursive=False, audit=False, inflight=None):
+        if index is None:
+            raise MissingArgument("Missing ACL index, or scheme and id")
+
+        if id is None:
+            if recursive or audit:
+                raise CLIException("ACL indexes differ between nodes, use scheme and id instead")
 
             try:
-                depth = int(depth)
+                index = int(index)
             except ValueError:
-                raise CLIException("Depth has to be an integer")
+                raise CLIException("ACL index has to be an integer")
 
-            if depth < 0:
-                raise CLIException("Depth can't be negative")
+            deleted = self.zookeeper.delete_acl(path, index)
+            self._cli.log("Deleted ACL from {}: {} {}", path, deleted.id.scheme, deleted.id.id)
+            return
 
-            return depth
+        from zoocli.zookeeper import removing_acl
 
-        def filter_matches(name):
-            return not name_filter or re.search(r"^{}$".format(name_filter), name)
+        scheme = index
+        change = removing_acl(scheme, id)
+        if audit:
+            return self._audit_acls(path, change, recursive, inflight)
 
-        def list_deep(root, depth):
-            if maxdepth is not None and depth > maxdepth:
-                return []
+        updated = self._update_acls(path, change, recursive, inflight)
+        self._cli.log("Deleted ACL from {} ({} nodes changed): {} {}", path, updated, scheme, id)
 
-            try:
-                child_list = self._zookeeper.list(root)
-            except ZooKeeperException as exc:
-                print(exc)
-                return []
+    @command
+    @completers('path')
+    @using_path(required=True)
+    def setacl(self, path=None, acl=None, recursive=False, audit=False, inflight=None):
+        if not acl:
+            raise MissingArgument("Missing ACL")
 
-            subnodes = []
-            for child in child_list:
-                child_path = os.path.join(root, child)
+        from zoocli.zookeeper import setting_acl, parse_acl
 
-                if mindepth is None or depth >= mindepth:
-                    if filter_matches(child):
-                        subnodes.append(child_path)
+        change = setting_acl(parse_acl(acl))
+        if audit:
+            return self._audit_acls(path, change, recursive, inflight)
+
+        updated = self._update_acls(path, change, recursive, inflight)
+        self._cli.log("Set ACL of {} ({} nodes changed): {}", path, updated, acl)
+
+    @command
+    @completers('path')
+    @using_path()
+    def grep(self, path=None, pattern=None, recursive=False, files=False, count=False, ignore_case=False,
+             max_size=None, inflight=None):
+        if not pattern:
+            raise MissingArgument("Missing pattern")
+
+        try:
+            regex = re.compile(pattern.encode(), re.IGNORECASE if ignore_case else 0)
+        except re.error as exc:
+            raise CLIException("Invalid pattern: {}".format(exc))
+
+        max_size = filter_count(max_size, 'max-size')
+        inflight = filter_inflight(inflight)
+
+        def matches():
+            nodes = self.zookeeper.read_data(path, None if recursive else 1, max_size, inflight, onerror=print)
+            for node, data in nodes:
+                # Data is searched as bytes, only printed lines get decoded
+                if files:
+                    if regex.search(data):
+                        yield node
+                    continue
+
+                lines = [line for line in data.split(b"\n") if regex.search(line)]
+                if count:
+                    if lines:
+                        yield "{}:{}".format(node, len(lines))
+                    continue
+
+                for line in lines:
+                    yield "{}:{}".format(node, line.decode('utf-8', errors='backslashreplace'))
+
+        return stream_lines(matches())
 
-                subnodes.extend(list_deep(child_path, depth + 1))
+    @command
+    @completers('path')
+    @using_path()
+    def find(self, path=None, name_filter=None, mindepth=None, maxdepth=None, inflight=None,
+             ephemeral=False, owner=None, size=None, mtime=None, ctime=None, children=None, version=None,
+             print0=False, sort=True):
+        try:
+            pattern = re.compile(r"^{}$".format(name_filter)) if name_filter else None
+        except re.error as exc:
+            raise CLIException("Invalid name pattern: {}".format(exc))
 
-            return subnodes
+        def filter_matches(name):
+            return not pattern or pattern.search(name)
 
         mindepth = filter_depth(mindepth)
         maxdepth = filter_depth(maxdepth)
+        inflight = filter_inflight(inflight)
+        predicates = stat_predicates(ephemeral, owner, size, mtime, ctime, children, version)
+
+        def candidates():
+            listing = self.zookeeper.walk(path, maxdepth, inflight, onerror=print, sort=sort)
+
+            if mindepth is None or mindepth == 0:
+                # The root's listing fails first if it is missing, before the root is printed
+                first = next(listing, None)
+                if first is None:
+                    # Not listed with -maxdepth 0
+                    self.zookeeper.stat(path)
+                else:
+                    listing = itertools.chain([first], listing)
+
+                name = path.split('/')[-1]
+                if filter_matches(name):
+                    yield path
+
+            for node, depth, child_list, _ in listing:
+                if mindepth is not None and depth + 1 < mindepth:
+                    continue
+
+                for child in child_list:
+                    if filter_matches(child):
+                        yield os.path.join(node, child)
 
-        result = []
-        if mindepth is None or mindepth == 0:
-            name = path.split('/')[-1]
-            if filter_matches(name):
-                result.append(path)
+        result = candidates()
 
-        result.extend(list_deep(path, 1))
+        # Only nodes passing the name and depth checks need their stat fetched
+        if predicates:
+            result = (node for node, stat in self.zookeeper.stats(result, inflight)
+                      if all(predicate(stat) for predicate in predicates))
 
-        return "\n".join(result)
+        return stream_lines(result, "\0" if print0 else "\n")
@@ -1,10 +1,15 @@
 from climb.completer import Completer
 from climb.paths import SEPARATOR, ROOT_PATH
 
+from zoocli.clusters import cluster_names, split_cluster
+
 
 class ZooCompleter(Completer):
 
     def path(self, arg, text):
+        cluster, arg = split_cluster(arg)
+        prefix = "{}:".format(cluster) if cluster else ""
+
         if arg and not arg.endswith(SEPARATOR):
             # List one level up
             absolute = arg.startswith(ROOT_PATH)
@@ -12,10 +17,15 @@ class ZooCompleter(Completer):
             if absolute:
                 arg = ROOT_PATH + arg
 
-        paths = [p for p in self._cli.commands.ls(path=arg).split()
+        commands = self._cli.commands
+        cluster, path = commands.resolve(prefix + arg)
+        paths = [p for p in commands.clusters.get(cluster).list(path)
                  if p.startswith(text)]
 
         if len(paths) == 1:
             return ["{}/".format(paths[0])]
 
         return paths
+
+    def cluster(self, arg, text):
+        return [name for name in cluster_names() if name.startswith(arg)]
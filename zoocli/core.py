@@ -1,14 +1,40 @@
 from climb import Climb
-from functools import partial
 
 from zoocli.args import ZooArgs
+from zoocli.clusters import DEFAULT_CLUSTER
 from zoocli.commands import ZooCommands
 from zoocli.completer import ZooCompleter
+from zoocli.output import is_stream, write_result
 
 
-ZooCLI = partial(Climb,
-                 'zoocli',
-                 args=ZooArgs,
-                 commands=ZooCommands,
-                 completer=ZooCompleter,
-                 skip_delims=['-'])
+class ZooCLI(Climb):
+
+    def __init__(self):
+        super().__init__('zoocli',
+                         args=ZooArgs,
+                         commands=ZooCommands,
+                         completer=ZooCompleter,
+                         skip_delims=['-'])
+
+    def _format_prompt(self):
+        # The default cluster keeps the plain prompt
+        if self._commands.cluster != DEFAULT_CLUSTER:
+            return self._prompt.format(path="{}:{}".format(self._commands.cluster, self._current_path))
+        return super()._format_prompt()
+
+    def execute(self, *args):
+        """Executes single command and returns result.
+
+        In interactive mode, streamed results are written out as they come
+        instead, and Ctrl+C stops the command rather than the console.
+        """
+        result = super().execute(*args)
+
+        if self._running and is_stream(result):
+            try:
+                write_result(result)
+            except KeyboardInterrupt:
+                print()
+            return None
+
+        return result
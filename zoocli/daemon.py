@@ -0,0 +1,199 @@
+import io
+import os
+import sys
+import json
+import shlex
+import socket
+import struct
+import hashlib
+import tempfile
+import socketserver
+from contextlib import redirect_stdout, redirect_stderr
+
+from zoocli.batch import run_request
+
+# Seconds without requests after which the daemon exits by default
+DEFAULT_IDLE_TIMEOUT = 600
+
+LENGTH = struct.Struct('>I')
+STATUS = struct.Struct('>i')
+# struct ucred: pid, uid, gid
+CREDENTIALS = struct.Struct('3i')
+
+
+def socket_path(hosts):
+    """Returns the daemon's socket path, one per user and ZooKeeper cluster."""
+    digest = hashlib.sha1(hosts.encode('utf-8')).hexdigest()[:16]
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, "zoocli-{}-{}.sock".format(os.getuid(), digest))
+
+
+def is_endless(request):
+    """Returns whether the request runs until interrupted, like watch or ensemble --watch.
+
+    Those run directly: the daemon handles one request at a time and doesn't
+    notice a client leaving, so it would stay blocked for every other one.
+    """
+    commands = [request['command']] if 'command' in request else []
+    for line in request.get('script', ()):
+        try:
+            commands.append(shlex.split(line, comments=True))
+        except ValueError:
+            continue
+
+    for args in commands:
+        if args and args[0] == 'watch':
+            return True
+        if args and args[0] == 'ensemble' and any(arg in ('-w', '--watch') or arg.startswith('--watch=')
+                                                  for arg in args[1:]):
+            return True
+    return False
+
+
+def _owner(client, path):
+    """Returns the uid of the process listening on the socket, or of the socket file where it can't be told."""
+    if hasattr(socket, 'SO_PEERCRED'):
+        _, uid, _ = CREDENTIALS.unpack(client.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, CREDENTIALS.size))
+        return uid
+    return os.stat(path).st_uid
+
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ConnectionError("Connection to zoocli daemon closed")
+    return data
+
+
+class FramedWriter(io.RawIOBase):
+    """Sends written data as length-prefixed frames; an empty frame ends the output."""
+
+    def __init__(self, file):
+        self._file = file
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            self._file.write(LENGTH.pack(len(data)) + bytes(data))
+            self._file.flush()
+        return len(data)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        prefix = self.rfile.read(LENGTH.size)
+        if not prefix:
+            # Client only checked whether the daemon is running
+            return
+
+        length, = LENGTH.unpack(prefix)
+        request = json.loads(_read_exactly(self.rfile, length).decode('utf-8'))
+
+        output = io.TextIOWrapper(io.BufferedWriter(FramedWriter(self.wfile)),
+                                  encoding='utf-8', line_buffering=True)
+        # Both go back to the client's stdout
+        with redirect_stdout(output), redirect_stderr(output):
+            status = self.server.execute(request)
+            output.flush()
+
+        self.wfile.write(LENGTH.pack(0) + STATUS.pack(status))
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Executes requests of zoocli clients over a single ZooKeeper session.
+
+    Requests are handled one at a time, each starting at the root path of the
+    default cluster and in the client's working directory. The server stops after `idle_timeout`
+    seconds without requests.
+    """
+
+    def __init__(self, cli, path, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self._cli = cli
+        self._idle = False
+        self.timeout = idle_timeout
+
+        # Only the current user may connect
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def execute(self, request):
+        # Nothing a previous request did, like connecting to another cluster, carries over
+        self._cli.commands.reset()
+
+        try:
+            os.chdir(request['cwd'])
+            return run_request(self._cli, request)
+        except Exception as exc:
+            # Never let a single request take the daemon down
+            print(exc)
+            return 1
+
+    def handle_timeout(self):
+        self._idle = True
+
+    def serve(self):
+        try:
+            while not self._idle:
+                self.handle_request()
+        finally:
+            self.server_close()
+            os.unlink(self.server_address)
+
+
+def serve(cli, path, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Runs the daemon on the socket until it becomes idle."""
+    if os.path.exists(path):
+        if send_request(path, None) is not None:
+            raise OSError("zoocli daemon is already running: {}".format(path))
+        # Left behind by a daemon that didn't exit cleanly
+        os.unlink(path)
+
+    server = DaemonServer(cli, path, idle_timeout)
+    server.serve()
+
+
+def send_request(path, request, output=None):
+    """Sends the request to the daemon and writes its output, returning the exit status.
+
+    Returns None if there is no daemon listening on the socket. Without a
+    request, only checks whether the daemon is running. A socket of another
+    user, who could read the commands and fake their output, raises OSError.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        if _owner(client, path) != os.getuid():
+            raise PermissionError("zoocli daemon socket is owned by another user: {}".format(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+    except OSError:
+        client.close()
+        raise
+
+    with client, client.makefile('rwb') as file:
+        if request is None:
+            return 0
+
+        body = json.dumps(request).encode('utf-8')
+        file.write(LENGTH.pack(len(body)) + body)
+        file.flush()
+
+        if output is None:
+            output = sys.stdout.buffer
+
+        while True:
+            length, = LENGTH.unpack(_read_exactly(file, LENGTH.size))
+            if not length:
+                break
+            output.write(_read_exactly(file, length))
+            output.flush()
+
+        status, = STATUS.unpack(_read_exactly(file, STATUS.size))
+        return status
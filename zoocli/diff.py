@@ -0,0 +1,166 @@
+import os
+from collections import deque
+from kazoo.exceptions import NoNodeError, NoAuthError
+
+from zoocli.exceptions import ZooKeeperException
+from zoocli.utils import pipeline, DEFAULT_INFLIGHT
+
+ADDED = 'A'
+REMOVED = 'D'
+CHANGED = 'M'
+
+
+class Completed(object):
+    """Already available result, with the interface of kazoo's async results."""
+
+    def __init__(self, value=None, exception=None):
+        self._value = value
+        self._exception = exception
+
+    def get(self):
+        if self._exception:
+            raise self._exception
+        return self._value
+
+
+class TreeSide(object):
+    """Subtree read from the server, addressed by paths relative to its root."""
+
+    def __init__(self, client, root):
+        self._client = client
+        self.root = root
+
+    def path(self, relative):
+        return os.path.join(self.root, relative) if relative else self.root
+
+    def list(self, relative):
+        return self._client.get_children_async(self.path(relative), include_data=True)
+
+    def get(self, relative):
+        return self._client.get_async(self.path(relative))
+
+    def same_data(self, stat, other_stat):
+        """Stats of different nodes can only tell that their data differs."""
+        return False if stat.data_length != other_stat.data_length else None
+
+
+class DumpSide(object):
+    """Subtree read from dump records, kept in memory for lookups by path."""
+
+    def __init__(self, root, records):
+        self.root = root
+        self._records = {}
+        self._children = {}
+
+        for record in records:
+            relative = os.path.relpath(record.path, root) if record.path != root else ''
+            self._records[relative] = record
+            if relative:
+                parent, name = os.path.split(relative)
+                self._children.setdefault(parent, []).append(name)
+
+    def path(self, relative):
+        return os.path.join(self.root, relative) if relative else self.root
+
+    def list(self, relative):
+        record = self._records.get(relative)
+        if record is None:
+            return Completed(exception=NoNodeError())
+        return Completed((self._children.get(relative, []), record.stat))
+
+    def get(self, relative):
+        record = self._records.get(relative)
+        if record is None:
+            return Completed(exception=NoNodeError())
+        return Completed((record.data or b"", record.stat))
+
+    def same_data(self, stat, other_stat):
+        """A node modified by the same transaction as the dumped one still has its data."""
+        if stat.data_length != other_stat.data_length:
+            return False
+        return True if stat.mzxid == other_stat.mzxid else None
+
+
+def diff(left, right, inflight=DEFAULT_INFLIGHT, onerror=None):
+    """Compares two subtrees, yielding (change, relative path) tuples in walk order.
+
+    Both sides are listed together, breadth-first, with up to `inflight`
+    listings pipelined. Nodes only on the right are ADDED and nodes only on
+    the left REMOVED, reported once for their whole subtree. The right side
+    decides from the stats whether data is the same; it is fetched, again
+    pipelined, only for nodes where the stats can't tell.
+    """
+    def request(item):
+        relative, stat, other_stat, _ = item
+        if right.same_data(stat, other_stat) is not None:
+            return None
+        return left.get(relative), right.get(relative)
+
+    for (relative, stat, other_stat, changes), results in pipeline(_listings(left, right, inflight, onerror),
+                                                                    request, inflight):
+        if results is None:
+            changed = not right.same_data(stat, other_stat)
+        else:
+            try:
+                changed = results[0].get()[0] != results[1].get()[0]
+            except NoNodeError:
+                # Deleted while comparing
+                continue
+            except NoAuthError:
+                if onerror:
+                    onerror(ZooKeeperException("No access to get node: {}".format(left.path(relative))))
+                continue
+
+        if changed:
+            yield CHANGED, relative
+
+        yield from changes
+
+
+def _listings(left, right, inflight, onerror):
+    """Yields (relative path, stat, other stat, child changes) for nodes on both sides."""
+    queue = deque([''])
+    pending = deque()
+
+    while queue or pending:
+        while queue and len(pending) < inflight:
+            relative = queue.popleft()
+            pending.append((relative, left.list(relative), right.list(relative)))
+
+        relative, result, other_result = pending.popleft()
+        try:
+            listing = _listing(left, relative, result)
+            other_listing = _listing(right, relative, other_result)
+        except ZooKeeperException as exc:
+            if not relative:
+                raise
+            if onerror:
+                onerror(exc)
+            continue
+
+        if listing is None or other_listing is None:
+            # Nodes deleted while comparing are skipped, only the roots have to exist
+            if not relative:
+                side = left if listing is None else right
+                raise ZooKeeperException("No such node: {}".format(side.path(relative)))
+            continue
+
+        children, stat = listing
+        other_children, other_stat = other_listing
+        children = set(children)
+        other_children = set(other_children)
+
+        changes = [(REMOVED, os.path.join(relative, child)) for child in sorted(children - other_children)]
+        changes.extend((ADDED, os.path.join(relative, child)) for child in sorted(other_children - children))
+        queue.extend(os.path.join(relative, child) for child in sorted(children & other_children))
+
+        yield relative, stat, other_stat, changes
+
+
+def _listing(side, relative, result):
+    try:
+        return result.get()
+    except NoNodeError:
+        return None
+    except NoAuthError:
+        raise ZooKeeperException("No access to list node: {}".format(side.path(relative)))
@@ -0,0 +1,241 @@
+import os
+import json
+import struct
+import base64
+from collections import namedtuple
+from kazoo.protocol.states import ZnodeStat
+from kazoo.security import ACL, Id
+
+from zoocli.exceptions import ZooKeeperException
+
+MAGIC = b"ZOODUMP"
+DELTA_MAGIC = b"ZOODLTA"
+VERSION = 1
+
+Record = namedtuple('Record', ['path', 'data', 'stat', 'acl'])
+# Node deleted, with its subtree, since the snapshot a delta dump applies on
+Deletion = namedtuple('Deletion', ['path'])
+
+# ZnodeStat fields: czxid, mzxid, ctime, mtime, version, cversion, aversion,
+# ephemeralOwner, dataLength, numChildren, pzxid
+STAT = struct.Struct('>qqqqiiiqiiq')
+LENGTH = struct.Struct('>I')
+STRING = struct.Struct('>H')
+DATA = struct.Struct('>i')
+PERMS = struct.Struct('>i')
+
+NULL_DATA = -1
+DELETED = -2
+
+
+def _pack_string(value):
+    value = value.encode('utf-8')
+    return STRING.pack(len(value)) + value
+
+
+def _unpack_string(buffer, offset):
+    length, = STRING.unpack_from(buffer, offset)
+    offset += STRING.size
+    return buffer[offset:offset + length].decode('utf-8'), offset + length
+
+
+class DumpWriter(object):
+    """Writes length-prefixed binary records.
+
+    The file starts with MAGIC (DELTA_MAGIC for delta dumps), a version byte
+    and the dumped root path. Each record is its length followed by path, data
+    (length -1 for null), stat and the list of ACLs. Deletions are only a path
+    and data length -2.
+    """
+
+    def __init__(self, file, root, delta=False):
+        self._file = file
+        self._file.write((DELTA_MAGIC if delta else MAGIC) + bytes([VERSION]) + _pack_string(root))
+
+    def write(self, record):
+        parts = [_pack_string(record.path)]
+
+        if isinstance(record, Deletion):
+            parts.append(DATA.pack(DELETED))
+        elif record.data is None:
+            parts.append(DATA.pack(NULL_DATA))
+        else:
+            parts.append(DATA.pack(len(record.data)))
+            parts.append(record.data)
+
+        if not isinstance(record, Deletion):
+            parts.append(STAT.pack(*record.stat))
+
+            parts.append(STRING.pack(len(record.acl)))
+            for acl in record.acl:
+                parts.append(PERMS.pack(acl.perms))
+                parts.append(_pack_string(acl.id.scheme))
+                parts.append(_pack_string(acl.id.id))
+
+        body = b"".join(parts)
+        self._file.write(LENGTH.pack(len(body)) + body)
+
+
+class JsonDumpWriter(object):
+    """Writes one JSON object per line, with data encoded in base64."""
+
+    def __init__(self, file, root, delta=False):
+        self._file = file
+        header = {'format': 'zoocli', 'version': VERSION, 'root': root}
+        if delta:
+            header['delta'] = True
+        self._write(header)
+
+    def write(self, record):
+        if isinstance(record, Deletion):
+            self._write({'path': record.path, 'deleted': True})
+            return
+
+        self._write({
+            'path': record.path,
+            'data': base64.b64encode(record.data).decode('ascii') if record.data is not None else None,
+            'stat': record.stat._asdict(),
+            'acl': [{'perms': acl.perms, 'scheme': acl.id.scheme, 'id': acl.id.id}
+                    for acl in record.acl],
+        })
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, separators=(',', ':')).encode('utf-8') + b"\n")
+
+
+def dump_writer(file, root, json_lines=False, delta=False):
+    if json_lines:
+        return JsonDumpWriter(file, root, delta)
+    return DumpWriter(file, root, delta)
+
+
+def read_dump(file):
+    """Returns the dumped root path and an iterator over the file's records.
+
+    The format (binary or JSON lines) is detected from the file's header.
+    Delta dumps can only be read on top of their base, see read_snapshot.
+    """
+    root, delta, records = _read(file)
+    if delta:
+        raise ZooKeeperException("Delta dump of {} needs the dumps it applies on".format(root))
+    return root, records
+
+
+def read_snapshot(files, stats_only=False):
+    """Returns the root path and {path: Record} of a full dump with delta dumps applied.
+
+    Files are read in order: a full dump first, then deltas, each taken
+    relative to the state before it. Records stay in parent-first order. With
+    `stats_only`, records keep no data and ACLs, which is all a delta needs.
+    """
+    nodes = {}
+    # Child names of every parent, so deletions don't scan all nodes for their subtree
+    children = {}
+    snapshot_root = None
+
+    for index, file in enumerate(files):
+        root, delta, records = _read(file)
+        if delta != (index > 0):
+            raise ZooKeeperException("Expected a full dump followed by delta dumps")
+        if snapshot_root is not None and root != snapshot_root:
+            raise ZooKeeperException("Delta dump of {} doesn't apply on dump of {}".format(root, snapshot_root))
+        snapshot_root = root
+
+        for record in records:
+            if isinstance(record, Deletion):
+                _delete(nodes, children, record.path)
+                continue
+
+            parent, name = os.path.split(record.path)
+            if name:
+                children.setdefault(parent, set()).add(name)
+            nodes[record.path] = record._replace(data=None, acl=None) if stats_only else record
+
+    if snapshot_root is None:
+        raise ZooKeeperException("No dump files")
+
+    return snapshot_root, nodes
+
+
+def _delete(nodes, children, path):
+    parent, name = os.path.split(path)
+    children.get(parent, set()).discard(name)
+
+    stack = [path]
+    while stack:
+        node = stack.pop()
+        nodes.pop(node, None)
+        stack.extend(os.path.join(node, child) for child in children.pop(node, ()))
+
+
+def _read(file):
+    header = file.read(len(MAGIC) + 1)
+    magic = header[:len(MAGIC)]
+
+    if magic in (MAGIC, DELTA_MAGIC):
+        if header[-1] != VERSION:
+            raise ZooKeeperException("Unsupported dump version: {}".format(header[-1]))
+
+        length, = STRING.unpack(file.read(STRING.size))
+        root = file.read(length).decode('utf-8')
+        return root, magic == DELTA_MAGIC, _read_records(file)
+
+    if header.startswith(b"{"):
+        line = json.loads((header + file.readline()).decode('utf-8'))
+        if line.get('format') != 'zoocli':
+            raise ZooKeeperException("Not a dump file")
+        return line['root'], line.get('delta', False), _read_json_records(file)
+
+    raise ZooKeeperException("Not a dump file")
+
+
+def _read_records(file):
+    while True:
+        prefix = file.read(LENGTH.size)
+        if not prefix:
+            return
+
+        length, = LENGTH.unpack(prefix)
+        body = file.read(length)
+        if len(body) != length:
+            raise ZooKeeperException("Truncated dump file")
+
+        path, offset = _unpack_string(body, 0)
+
+        data_length, = DATA.unpack_from(body, offset)
+        offset += DATA.size
+        if data_length == DELETED:
+            yield Deletion(path)
+            continue
+
+        if data_length == NULL_DATA:
+            data = None
+        else:
+            data = body[offset:offset + data_length]
+            offset += data_length
+
+        stat = ZnodeStat(*STAT.unpack_from(body, offset))
+        offset += STAT.size
+
+        count, = STRING.unpack_from(body, offset)
+        offset += STRING.size
+        acl = []
+        for _ in range(count):
+            perms, = PERMS.unpack_from(body, offset)
+            scheme, offset = _unpack_string(body, offset + PERMS.size)
+            id, offset = _unpack_string(body, offset)
+            acl.append(ACL(perms, Id(scheme, id)))
+
+        yield Record(path, data, stat, acl)
+
+
+def _read_json_records(file):
+    for line in file:
+        obj = json.loads(line.decode('utf-8'))
+        if obj.get('deleted'):
+            yield Deletion(obj['path'])
+            continue
+
+        data = base64.b64decode(obj['data']) if obj['data'] is not None else None
+        acl = [ACL(acl['perms'], Id(acl['scheme'], acl['id'])) for acl in obj['acl']]
+        yield Record(obj['path'], data, ZnodeStat(**obj['stat']), acl)
@@ -0,0 +1,145 @@
+import socket
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Seconds to wait for each server's answers by default
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_PORT = 2181
+
+COMMANDS = ('srvr', 'mntr', 'cons')
+
+HostStatus = namedtuple('HostStatus', ['host', 'role', 'latency', 'outstanding', 'znodes', 'watches',
+                                       'connections', 'error'])
+
+# Table rows: (title, HostStatus field)
+ROWS = [
+    ("role", 'role'),
+    ("latency min/avg/max", 'latency'),
+    ("outstanding", 'outstanding'),
+    ("znodes", 'znodes'),
+    ("watches", 'watches'),
+    ("connections", 'connections'),
+]
+
+
+def parse_hosts(hosts):
+    """Returns (host, port) pairs of a connection string, like host1:2181,host2:2181/chroot."""
+    hosts = hosts.split('/', 1)[0]
+
+    result = []
+    for host in hosts.split(','):
+        host = host.strip()
+        if not host:
+            continue
+
+        name, _, port = host.rpartition(':')
+        if not name or not port.isdigit():
+            name, port = host, DEFAULT_PORT
+        result.append((name.strip('[]'), int(port)))
+
+    return result
+
+
+def four_letter_word(host, port, command, timeout=DEFAULT_TIMEOUT):
+    """Sends a four letter word command to the server and returns its answer."""
+    with socket.create_connection((host, port), timeout=timeout) as connection:
+        connection.sendall(command.encode('ascii'))
+
+        chunks = []
+        while True:
+            chunk = connection.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+    return b"".join(chunks).decode('utf-8', errors='replace')
+
+
+def parse_mntr(text):
+    """Returns {key: value} of mntr output, which has one tab-separated pair per line."""
+    values = {}
+    for line in text.splitlines():
+        key, _, value = line.partition('\t')
+        if value:
+            values[key.strip()] = value.strip()
+    return values
+
+
+def parse_srvr(text):
+    """Returns {field: value} of srvr output, which has 'Field: value' lines."""
+    values = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(': ')
+        if value:
+            values[key.strip()] = value.strip()
+    return values
+
+
+def host_status(host, answers):
+    """Returns HostStatus of a server from its {command: answer or OSError} answers.
+
+    srvr works on any server; mntr (for watch counts) and cons may not be
+    whitelisted, in which case their values are left out.
+    """
+    srvr = answers['srvr']
+    if isinstance(srvr, OSError):
+        return HostStatus(host, None, None, None, None, None, None, str(srvr) or type(srvr).__name__)
+
+    srvr = parse_srvr(srvr)
+    if 'Mode' not in srvr:
+        return HostStatus(host, None, None, None, None, None, None, "srvr command not allowed")
+
+    def optional(command):
+        answer = answers[command]
+        return "" if isinstance(answer, OSError) else answer
+
+    mntr = parse_mntr(optional('mntr'))
+    cons = [line for line in optional('cons').splitlines() if line.strip().startswith('/')]
+
+    return HostStatus(host,
+                      srvr['Mode'],
+                      srvr.get('Latency min/avg/max'),
+                      srvr.get('Outstanding', mntr.get('zk_outstanding_requests')),
+                      srvr.get('Node count', mntr.get('zk_znode_count')),
+                      mntr.get('zk_watch_count'),
+                      str(len(cons)) if cons else mntr.get('zk_num_alive_connections'),
+                      None)
+
+
+def poll(hosts, timeout=DEFAULT_TIMEOUT):
+    """Returns HostStatus of every (host, port), sending all commands to all servers concurrently.
+
+    Each command waits at most `timeout` seconds, so one lagging server
+    doesn't hold up the others.
+    """
+    def answer(host, port, command):
+        try:
+            return four_letter_word(host, port, command, timeout)
+        except OSError as exc:
+            return exc
+
+    if not hosts:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(hosts) * len(COMMANDS)) as executor:
+        futures = [{command: executor.submit(answer, host, port, command) for command in COMMANDS}
+                   for host, port in hosts]
+
+    return [host_status("{}:{}".format(host, port), {command: future.result() for command, future in answers.items()})
+            for (host, port), answers in zip(hosts, futures)]
+
+
+def format_table(statuses):
+    """Formats statuses side by side, one column per server."""
+    header = ["server"] + [status.host for status in statuses]
+    rows = [header]
+    for title, field in ROWS:
+        rows.append([title] + [getattr(status, field) or "-" for status in statuses])
+
+    errors = [status for status in statuses if status.error]
+    if errors:
+        rows.append(["error"] + [status.error or "" for status in statuses])
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+                     for row in rows)
@@ -0,0 +1,257 @@
+import time
+import threading
+
+from zoocli.utils import failed
+
+# Upper bounds of latency histogram buckets, in milliseconds; slower requests fall in the last bucket
+BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# Client methods sending a single request, also instrumented in their *_async variants
+OPERATIONS = {'get', 'get_children', 'exists', 'create', 'set', 'delete', 'get_acls', 'set_acls'}
+# Operations whose second argument is the data sent
+WRITES = {'create', 'set'}
+
+
+class OperationStats(object):
+    __slots__ = ('count', 'errors', 'bytes_out', 'bytes_in', 'latency', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def copy(self):
+        return self.combine(OperationStats(), 1)
+
+    def combine(self, other, sign):
+        """Returns these stats with the other ones added (sign 1) or subtracted (sign -1)."""
+        stats = OperationStats()
+        for name in self.__slots__[:-1]:
+            setattr(stats, name, getattr(self, name) + sign * getattr(other, name))
+        stats.buckets = [count + sign * other_count for count, other_count in zip(self.buckets, other.buckets)]
+        return stats
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the percentile, None for the last bucket."""
+        threshold = self.count * fraction
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return None
+
+    def to_dict(self):
+        bounds = [str(bound) for bound in BUCKETS] + ['inf']
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'latency_ms': round(self.latency * 1000, 3),
+            'histogram_ms': dict(zip(bounds, self.buckets)),
+        }
+
+
+class Metrics(object):
+    """Request counts, payload bytes and latency histograms per operation type.
+
+    Bytes are payload sizes (paths, data and child names), not the exact wire
+    format. Updated from kazoo's callback threads as well, hence the lock.
+    """
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, latency, bytes_out=0, bytes_in=0, error=False):
+        bucket = len(BUCKETS)
+        for index, bound in enumerate(BUCKETS):
+            if latency * 1000 <= bound:
+                bucket = index
+                break
+
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = OperationStats()
+
+            stats.count += 1
+            stats.errors += error
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.latency += latency
+            stats.buckets[bucket] += 1
+
+    def snapshot(self):
+        """Returns {operation: OperationStats} copies of the current totals."""
+        with self._lock:
+            return {operation: stats.copy() for operation, stats in self._operations.items()}
+
+    def since(self, before):
+        """Returns {operation: OperationStats} of requests made after the `before` snapshot."""
+        current = self.snapshot()
+        changes = {operation: stats.combine(before.get(operation, OperationStats()), -1)
+                   for operation, stats in current.items()}
+        return {operation: stats for operation, stats in changes.items() if stats.count}
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+def format_stats(operations):
+    """Formats {operation: OperationStats} as a table, with a total line."""
+    lines = ["{:<14}{:>8}{:>8}{:>12}{:>10}{:>10}{:>12}{:>12}".format(
+        "operation", "count", "errors", "avg ms", "p50 ms", "p99 ms", "bytes out", "bytes in")]
+
+    total = OperationStats()
+    for operation in sorted(operations):
+        stats = operations[operation]
+        lines.append(_format_line(operation, stats))
+        total = total.combine(stats, 1)
+
+    lines.append(_format_line("total", total))
+    return "\n".join(lines)
+
+
+def _format_line(name, stats):
+    def bound(fraction):
+        value = stats.percentile(fraction)
+        return "<={}".format(value) if value is not None else ">{}".format(BUCKETS[-1])
+
+    average = stats.latency * 1000 / stats.count if stats.count else 0
+    return "{:<14}{:>8}{:>8}{:>12.2f}{:>10}{:>10}{:>12}{:>12}".format(
+        name, stats.count, stats.errors, average, bound(0.5) if stats.count else "-",
+        bound(0.99) if stats.count else "-", stats.bytes_out, stats.bytes_in)
+
+
+def _size(value):
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return 0
+
+
+def _request_size(operation, args, kwargs):
+    size = _size(args[0] if args else kwargs.get('path'))
+    if operation in WRITES:
+        size += _size(args[1] if len(args) > 1 else kwargs.get('value'))
+    return size
+
+
+def _response_size(operation, value):
+    if operation == 'get_children':
+        children = value[0] if isinstance(value, tuple) else value
+        if isinstance(children, list):
+            return sum(_size(child) for child in children)
+    elif operation == 'get' and isinstance(value, tuple):
+        return _size(value[0])
+    elif operation == 'create':
+        return _size(value)
+    return 0
+
+
+class Instrumented(object):
+    """Proxy of a KazooClient recording every request in Metrics.
+
+    Synchronous calls are timed around the call. Async ones are timed until
+    their result is set, from kazoo's callback thread. Transactions are
+    recorded as single requests when committed. Other attributes are passed
+    through as they are.
+    """
+
+    def __init__(self, client, metrics):
+        self._client = client
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+
+        if name in OPERATIONS:
+            return self._timed(name, attribute)
+        if name.endswith('_async') and name[:-len('_async')] in OPERATIONS:
+            return self._timed_async(name[:-len('_async')], attribute)
+        if name == 'transaction':
+            return lambda *args, **kwargs: InstrumentedTransaction(attribute(*args, **kwargs), self._metrics)
+        return attribute
+
+    def _timed(self, operation, method):
+        metrics = self._metrics
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                value = method(*args, **kwargs)
+            except Exception:
+                metrics.record(operation, time.perf_counter() - start, _request_size(operation, args, kwargs),
+                               error=True)
+                raise
+
+            metrics.record(operation, time.perf_counter() - start, _request_size(operation, args, kwargs),
+                           _response_size(operation, value))
+            return value
+
+        return call
+
+    def _timed_async(self, operation, method):
+        metrics = self._metrics
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            bytes_out = _request_size(operation, args, kwargs)
+
+            def completed(result):
+                latency = time.perf_counter() - start
+                if result.exception is not None:
+                    metrics.record(operation, latency, bytes_out, error=True)
+                else:
+                    metrics.record(operation, latency, bytes_out, _response_size(operation, result.value))
+
+            result.rawlink(completed)
+            return result
+
+        return call
+
+
+class InstrumentedTransaction(object):
+    """Proxy of a kazoo transaction, recorded as one request with the size of all its operations."""
+
+    def __init__(self, transaction, metrics):
+        self._transaction = transaction
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._transaction, name)
+
+    def _bytes_out(self):
+        return sum(_size(getattr(operation, 'path', None)) + _size(getattr(operation, 'data', None))
+                   for operation in getattr(self._transaction, 'operations', []))
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            results = self._transaction.commit()
+        except Exception:
+            self._metrics.record('transaction', time.perf_counter() - start, self._bytes_out(), error=True)
+            raise
+
+        self._metrics.record('transaction', time.perf_counter() - start, self._bytes_out(), error=failed(results))
+        return results
+
+    def commit_async(self):
+        start = time.perf_counter()
+        bytes_out = self._bytes_out()
+        result = self._transaction.commit_async()
+
+        def completed(result):
+            error = result.exception is not None or failed(result.value)
+            self._metrics.record('transaction', time.perf_counter() - start, bytes_out, error=error)
+
+        result.rawlink(completed)
+        return result
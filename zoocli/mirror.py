@@ -0,0 +1,204 @@
+import os
+import queue
+import threading
+from collections import deque
+from kazoo.exceptions import NoNodeError, NoAuthError, ZookeeperError
+from kazoo.protocol.states import EventType
+
+
+class MirrorNode(object):
+    __slots__ = ('data', 'stat', 'children')
+
+    def __init__(self, data, stat, children):
+        self.data = data
+        self.stat = stat
+        self.children = children
+
+
+class Mirror(object):
+    """Local copy of a subtree, kept up to date with data and child watches.
+
+    Watch callbacks only queue events, which are handled by a worker thread,
+    so kazoo's callback thread never blocks on requests. Nodes that could not
+    be read are missing from the mirror; callers should fall back to the
+    server for any path the mirror doesn't know about.
+    """
+
+    def __init__(self, client, root, inflight):
+        self._client = client
+        self._root = root
+        self._inflight = inflight
+        self._nodes = {}
+        self._lock = threading.RLock()
+        self._events = queue.Queue()
+        self._worker = None
+
+    @property
+    def root(self):
+        return self._root
+
+    def start(self):
+        self._load(self._root)
+
+        self._worker = threading.Thread(target=self._process, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        if self._worker:
+            self._events.put(None)
+            self._worker = None
+
+    def get(self, path):
+        with self._lock:
+            return self._nodes.get(path)
+
+    def walk(self, path, maxdepth=None, sort=True):
+        """Walks the mirrored subtree the same way ZooKeeper.walk does."""
+        queue = deque()
+        if maxdepth is None or maxdepth > 0:
+            queue.append((path, 0))
+
+        while queue:
+            node, depth = queue.popleft()
+            mirrored = self.get(node)
+            if mirrored is None:
+                continue
+
+            children = sorted(mirrored.children) if sort else mirrored.children
+            yield node, depth, children, mirrored.stat
+
+            if maxdepth is None or depth + 1 < maxdepth:
+                queue.extend((os.path.join(node, child), depth + 1) for child in children)
+
+    def update(self, path, data, stat):
+        with self._lock:
+            node = self._nodes.get(path)
+            if node and stat.mzxid >= node.stat.mzxid:
+                node.data = data
+                node.stat = stat
+
+    def refresh(self, path):
+        """Loads the node (and any missing ancestors) after it was created."""
+        ancestors = []
+        parent = os.path.dirname(path)
+        while self.covers(parent) and self.get(parent) is None:
+            ancestors.append(parent)
+            parent = os.path.dirname(parent)
+
+        for ancestor in reversed(ancestors):
+            self._load_node(ancestor)
+
+        self._load(path)
+
+    def remove(self, path):
+        with self._lock:
+            self._remove_tree(path)
+
+            parent = self._nodes.get(os.path.dirname(path))
+            name = os.path.basename(path)
+            if parent and name in parent.children:
+                parent.children = [child for child in parent.children if child != name]
+
+    def covers(self, path):
+        return path == self._root or path.startswith(self._root.rstrip('/') + '/')
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _load(self, path):
+        queue = deque([path])
+        pending = deque()
+
+        while queue or pending:
+            while queue and len(pending) < self._inflight:
+                node = queue.popleft()
+                pending.append((node,
+                                self._client.get_async(node, watch=self._data_changed),
+                                self._client.get_children_async(node, watch=self._children_changed)))
+
+            node, data_result, children_result = pending.popleft()
+            try:
+                data, stat = data_result.get()
+                children = children_result.get()
+            except (NoNodeError, NoAuthError):
+                continue
+
+            self._add(node, data, stat, children)
+            queue.extend(os.path.join(node, child) for child in children)
+
+    def _load_node(self, path):
+        try:
+            data, stat = self._client.get(path, watch=self._data_changed)
+            children = self._client.get_children(path, watch=self._children_changed)
+        except (NoNodeError, NoAuthError):
+            return
+
+        self._add(path, data, stat, children)
+
+    def _add(self, path, data, stat, children):
+        with self._lock:
+            self._nodes[path] = MirrorNode(data, stat, children)
+
+            parent = self._nodes.get(os.path.dirname(path))
+            name = os.path.basename(path)
+            if path != self._root and parent and name not in parent.children:
+                parent.children = parent.children + [name]
+
+    def _remove_tree(self, path):
+        node = self._nodes.pop(path, None)
+        if node:
+            for child in node.children:
+                self._remove_tree(os.path.join(path, child))
+
+    def _data_changed(self, event):
+        self._events.put(event)
+
+    def _children_changed(self, event):
+        self._events.put(event)
+
+    def _process(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+
+            try:
+                self._handle(event)
+            except ZookeeperError:
+                # Node's watches are gone, make reads fall back to the server
+                self.remove(event.path)
+
+    def _handle(self, event):
+        path = event.path
+        if self.get(path) is None:
+            return
+
+        if event.type == EventType.DELETED:
+            self.remove(path)
+        elif event.type == EventType.CHANGED:
+            try:
+                data, stat = self._client.get(path, watch=self._data_changed)
+            except NoNodeError:
+                self.remove(path)
+            else:
+                self.update(path, data, stat)
+        elif event.type == EventType.CHILD:
+            try:
+                children = self._client.get_children(path, watch=self._children_changed)
+            except NoNodeError:
+                self.remove(path)
+                return
+
+            with self._lock:
+                node = self._nodes.get(path)
+                if node is None:
+                    return
+
+                for child in set(node.children) - set(children):
+                    self._remove_tree(os.path.join(path, child))
+
+                added = [child for child in children if child not in node.children]
+                node.children = children
+
+            for child in added:
+                self._load(os.path.join(path, child))
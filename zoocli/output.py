@@ -0,0 +1,44 @@
+import sys
+from collections.abc import Iterator
+
+
+def is_stream(result):
+    return isinstance(result, Iterator)
+
+
+def stream_lines(items, terminator="\n"):
+    """Yields each item followed by the terminator."""
+    for item in items:
+        yield item + terminator
+
+
+def stream_words(items, separator=" "):
+    """Yields items separated by the separator, ending with a newline if there were any."""
+    first = True
+    for item in items:
+        yield item if first else separator + item
+        first = False
+
+    if not first:
+        yield "\n"
+
+
+def write_result(result, file=None):
+    """Writes command's result: strings are printed, streams are written chunk by chunk.
+
+    Bytes chunks in a stream are written as they are to the file's underlying buffer.
+    """
+    if file is None:
+        file = sys.stdout
+
+    if not is_stream(result):
+        print(result, file=file)
+        return
+
+    for chunk in result:
+        if isinstance(chunk, bytes):
+            file.flush()
+            file.buffer.write(chunk)
+        else:
+            file.write(chunk)
+    file.flush()
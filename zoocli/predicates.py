@@ -0,0 +1,65 @@
+import time
+from climb.exceptions import CLIException
+
+DAY = 24 * 60 * 60
+
+
+def parse_comparison(value, name):
+    """Parses find's numeric argument: +N (more than N), -N (less than N) or N (exactly N)."""
+    try:
+        number = int(value.lstrip('+-'))
+    except ValueError:
+        raise CLIException("Argument of -{} has to be a number, optionally prefixed with + or -".format(name))
+
+    if value.startswith('+'):
+        return lambda actual: actual > number
+    elif value.startswith('-'):
+        return lambda actual: actual < number
+
+    return lambda actual: actual == number
+
+
+def stat_predicates(ephemeral=False, owner=None, size=None, mtime=None, ctime=None,
+                    children=None, version=None, now=None):
+    """Returns a list of functions testing a node's stat, one for each given option.
+
+    -mtime and -ctime count whole days since the node was modified or created.
+    """
+    now = time.time() if now is None else now
+
+    def days_since(timestamp):
+        return int((now - timestamp) // DAY)
+
+    predicates = []
+
+    if ephemeral:
+        predicates.append(lambda stat: stat.ephemeralOwner != 0)
+
+    if owner is not None:
+        try:
+            session = int(owner, 0)
+        except ValueError:
+            raise CLIException("Owner has to be a session id")
+        predicates.append(lambda stat: stat.ephemeralOwner == session)
+
+    if size is not None:
+        matches_size = parse_comparison(size, 'size')
+        predicates.append(lambda stat: matches_size(stat.data_length))
+
+    if mtime is not None:
+        matches_mtime = parse_comparison(mtime, 'mtime')
+        predicates.append(lambda stat: matches_mtime(days_since(stat.last_modified)))
+
+    if ctime is not None:
+        matches_ctime = parse_comparison(ctime, 'ctime')
+        predicates.append(lambda stat: matches_ctime(days_since(stat.created)))
+
+    if children is not None:
+        matches_children = parse_comparison(children, 'children')
+        predicates.append(lambda stat: matches_children(stat.children_count))
+
+    if version is not None:
+        matches_version = parse_comparison(version, 'version')
+        predicates.append(lambda stat: matches_version(stat.version))
+
+    return predicates
@@ -1,5 +1,60 @@
 import datetime
+from collections import deque
+
+# Maximum number of asynchronous requests kept in flight by default
+DEFAULT_INFLIGHT = 64
+# Number of operations sent in a single multi-op transaction by default
+DEFAULT_BATCH_SIZE = 100
+
+
+# Sequential nodes end with a 10 digit counter
+SEQUENCE_DIGITS = 10
+
 
 def timestamp_to_date(timestamp):
     date = datetime.datetime.fromtimestamp(timestamp)
     return date.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def sequence_number(name):
+    suffix = name[-SEQUENCE_DIGITS:]
+    if len(suffix) == SEQUENCE_DIGITS and suffix.isdigit():
+        return int(suffix)
+    return None
+
+
+def sequence_key(name):
+    """Orders sequential nodes by their counter, whatever their prefix, and other nodes by name after them."""
+    number = sequence_number(name)
+    return (number is None, number or 0, name)
+
+
+def pipeline(items, request, inflight):
+    """Calls `request` for each item, keeping up to `inflight` results pending.
+
+    Yields (item, async_result) tuples in the order of `items`.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, request(item)))
+        if len(pending) >= inflight:
+            yield pending.popleft()
+
+    while pending:
+        yield pending.popleft()
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def failed(results):
+    return any(isinstance(result, Exception) for result in results)
@@ -0,0 +1,182 @@
+import os
+import time
+import queue
+import threading
+from collections import deque, namedtuple
+from kazoo.exceptions import NoNodeError, NoAuthError
+from kazoo.protocol.states import EventType
+
+from zoocli.utils import DEFAULT_INFLIGHT
+
+CREATED = 'created'
+DELETED = 'deleted'
+CHANGED = 'changed'
+MISSED = 'missed'
+
+# Changes seen by a Watcher: versions are data versions, or None if not known.
+# `missed` counts changes made before the watch was re-armed: data changes for
+# CHANGED, children created or deleted for MISSED.
+Change = namedtuple('Change', ['time', 'type', 'path', 'old_version', 'new_version', 'missed'])
+
+
+class Watcher(object):
+    """Reports changes of a node, or of a whole subtree, with data and child watches.
+
+    Watch callbacks only queue events. Changed nodes are re-read, re-arming
+    their watches, as changes are consumed. Versions are compared with the
+    last ones seen, so changes made before a watch was re-armed are counted
+    as missed instead of silently lost.
+    """
+
+    def __init__(self, client, root, recursive=False, inflight=DEFAULT_INFLIGHT):
+        self._client = client
+        self._root = root
+        self._recursive = recursive
+        self._inflight = inflight
+        # path: [data version, children version]
+        self._versions = {}
+        self._children = {}
+        self._events = queue.Queue()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Sets watches on all watched nodes, the root's even if it doesn't exist yet."""
+        if self._client.exists(self._root, watch=self._data_changed):
+            self._load(self._root)
+
+    def stop(self):
+        self._stopped.set()
+        self._events.put((None, None))
+
+    def __len__(self):
+        return len(self._versions)
+
+    def changes(self):
+        """Yields Changes as watches fire, until stopped."""
+        while True:
+            event, received = self._events.get()
+            if event is None or self._stopped.is_set():
+                return
+
+            yield from self._handle(event, received)
+
+    def _watched(self, path):
+        return path == self._root or (self._recursive and os.path.dirname(path) in self._versions)
+
+    def _load(self, path):
+        """Sets watches on the node and, if recursive, its subtree. Returns the loaded paths."""
+        queue = deque([path])
+        pending = deque()
+        loaded = []
+
+        while queue or pending:
+            while queue and len(pending) < self._inflight:
+                node = queue.popleft()
+                pending.append((node,
+                                self._client.exists_async(node, watch=self._data_changed),
+                                self._client.get_children_async(node, watch=self._children_changed,
+                                                                include_data=True)))
+
+            node, stat_result, children_result = pending.popleft()
+            try:
+                stat_result.get()
+                children, stat = children_result.get()
+            except (NoNodeError, NoAuthError):
+                continue
+
+            self._versions[node] = [stat.version, stat.cversion]
+            self._children[node] = set(children)
+            loaded.append(node)
+
+            if self._recursive:
+                queue.extend(os.path.join(node, child) for child in children)
+
+        return loaded
+
+    def _remove(self, path):
+        """Forgets the node and its subtree, returning whether it was watched."""
+        if self._versions.pop(path, None) is None:
+            return False
+
+        for child in self._children.pop(path, ()):
+            self._remove(os.path.join(path, child))
+        return True
+
+    def _data_changed(self, event):
+        if not self._stopped.is_set():
+            self._events.put((event, time.time()))
+
+    def _children_changed(self, event):
+        if not self._stopped.is_set():
+            self._events.put((event, time.time()))
+
+    def _handle(self, event, received):
+        path = event.path
+
+        if event.type in (EventType.CREATED, EventType.CHANGED, EventType.DELETED):
+            versions = self._versions.get(path)
+            if event.type == EventType.DELETED and path != self._root:
+                # A watch on a missing node lasts until its path is created again, which for sequential nodes is
+                # never; the parent's child watch reports it if it is
+                stat = self._client.exists(path)
+                if stat is not None:
+                    stat = self._client.exists(path, watch=self._data_changed)
+            else:
+                stat = self._client.exists(path, watch=self._data_changed)
+
+            if stat is None:
+                if self._remove(path):
+                    # So that the parent's listing reports the node if it is created again
+                    self._children.get(os.path.dirname(path), set()).discard(os.path.basename(path))
+                    yield Change(received, DELETED, path, versions[0], None, 0)
+                return
+
+            if versions is None:
+                # Created, either the root or a node not yet seen in its parent's listing
+                if self._watched(path) and path not in self._versions:
+                    self._load(path)
+                    yield Change(received, CREATED, path, None, stat.version, 0)
+                return
+
+            old_version, versions[0] = versions[0], stat.version
+            if stat.version != old_version:
+                missed = max(stat.version - old_version - 1, 0)
+                yield Change(received, CHANGED, path, old_version, stat.version, missed)
+
+        elif event.type == EventType.CHILD:
+            versions = self._versions.get(path)
+            if versions is None:
+                return
+
+            try:
+                children, stat = self._client.get_children(path, watch=self._children_changed, include_data=True)
+            except (NoNodeError, NoAuthError):
+                return
+
+            known = self._children[path]
+            children = set(children)
+            removed = known - children
+            added = children - known
+            self._children[path] = children
+
+            for child in sorted(removed):
+                node = os.path.join(path, child)
+                old_version = self._versions.get(node, [None])[0]
+                if self._remove(node) or not self._recursive:
+                    yield Change(received, DELETED, node, old_version, None, 0)
+
+            for child in sorted(added):
+                node = os.path.join(path, child)
+                if self._recursive:
+                    if node in self._versions:
+                        # Already reported by its own watch, left by a change that raced its deletion
+                        continue
+                    for loaded in self._load(node):
+                        yield Change(received, CREATED, loaded, None, self._versions[loaded][0], 0)
+                else:
+                    yield Change(received, CREATED, node, None, None, 0)
+
+            old_version, versions[1] = versions[1], stat.cversion
+            missed = stat.cversion - old_version - len(removed) - len(added)
+            if missed > 0:
+                yield Change(received, MISSED, path, None, None, missed)
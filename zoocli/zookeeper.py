@@ -1,8 +1,24 @@
+import os
+import glob
+import fnmatch
+from collections import deque
 from kazoo.client import KazooClient
-from kazoo.exceptions import NoNodeError, NodeExistsError, NotEmptyError, InvalidACLError, NoAuthError
-from kazoo.security import make_acl, make_digest_acl
+from kazoo.exceptions import (BadVersionError, NoNodeError, NodeExistsError, NotEmptyError, InvalidACLError,
+                              NoAuthError, ZookeeperError)
+from kazoo.protocol.states import KazooState, ZnodeStat
+from kazoo.security import Permissions, make_acl, make_digest_acl, make_digest_acl_credential
 
+from zoocli.cache import ChildrenCache
+from zoocli.diff import TreeSide, DumpSide, diff
+from zoocli.dump import Record, Deletion
 from zoocli.exceptions import ZooKeeperException
+from zoocli.metrics import Metrics, Instrumented
+from zoocli.mirror import Mirror, MirrorNode
+from zoocli.watch import Watcher
+from zoocli.utils import pipeline, batches, failed, DEFAULT_INFLIGHT, DEFAULT_BATCH_SIZE
+
+# Memory limit of the children cache by default, in megabytes
+DEFAULT_CACHE_SIZE = 16
 
 PERMS_MAP = {
     'a': 'admin',
@@ -12,55 +28,517 @@ PERMS_MAP = {
     'w': 'write',
 }
 
+# Attempts to change a node's ACL that keeps being changed by other clients
+ACL_RETRIES = 5
+
+
 def get_permissions(permissions):
-    return {PERMS_MAP[perm]: True for perm in permissions}
+    try:
+        return {PERMS_MAP[perm]: True for perm in permissions}
+    except KeyError as exc:
+        raise ZooKeeperException("Invalid permission: {}".format(exc.args[0]))
+
+
+def make_acl_entry(permissions, scheme, id):
+    perms = get_permissions(permissions)
+
+    if scheme == "digest":
+        try:
+            username, password = id.split(":")
+        except ValueError:
+            raise ZooKeeperException("Digest id has to be in user:password format")
+        return make_digest_acl(username, password, **perms)
+
+    return make_acl(scheme, id, **perms)
+
+
+def parse_acl(text):
+    """Returns ACL entries of comma-separated scheme:id:permissions, with digest ids already hashed."""
+    entries = []
+    for entry in text.split(','):
+        rest, _, permissions = entry.rpartition(':')
+        scheme, _, id = rest.partition(':')
+        if not scheme or not id:
+            raise ZooKeeperException("ACL has to be in scheme:id:permissions format: {}".format(entry))
+        entries.append(make_acl(scheme, id, **get_permissions(permissions)))
+    return entries
+
+
+def format_acl(acl):
+    return ",".join("{}:{}:{}".format(entry.id.scheme, entry.id.id,
+                                      "".join(letter for letter, name in sorted(PERMS_MAP.items())
+                                              if entry.perms & getattr(Permissions, name.upper())))
+                    for entry in acl)
+
+
+# ACL changes take the current ACL and return the new one, or None if it complies already
+
+def adding_acl(entry):
+    def change(acl):
+        if entry in acl:
+            return None
+        # Replaces permissions of the same id
+        return [current for current in acl if current.id != entry.id] + [entry]
+    return change
+
+
+def removing_acl(scheme, id):
+    ids = {id}
+    if scheme == "digest" and id.count(":") == 1:
+        # Also matches user:password against the hashed id
+        ids.add(make_digest_acl_credential(*id.split(":")))
+
+    def change(acl):
+        kept = [entry for entry in acl if entry.id.scheme != scheme or entry.id.id not in ids]
+        return kept if len(kept) != len(acl) else None
+    return change
+
+
+def setting_acl(entries):
+    def change(acl):
+        return None if set(acl) == set(entries) else list(entries)
+    return change
 
 
 class ZooKeeper(object):
 
-    def __init__(self, hosts, user=None, password=None):
-        self._zookeeper = KazooClient(hosts=hosts)
+    def __init__(self, hosts, user=None, password=None, cache_size=DEFAULT_CACHE_SIZE, metrics=None):
+        self._cache = ChildrenCache(int(cache_size) * 1024 * 1024)
+        self._mirror = None
+        self.metrics = metrics or Metrics()
+
+        # Every request made by zoocli goes through the instrumented proxy
+        self._zookeeper = Instrumented(KazooClient(hosts=hosts), self.metrics)
+        self._zookeeper.add_listener(self._state_changed)
         self._zookeeper.start()
 
         if user and password:
             self._zookeeper.add_auth('digest', '{}:{}'.format(user, password))
 
     def stop(self):
+        self.unmirror()
+
         if self._zookeeper:
             self._zookeeper.stop()
             self._zookeeper.close()
             self._zookeeper = None
 
-    def list(self, path):
+    def _state_changed(self, state):
+        # Watches may be lost while disconnected, so cached entries can't be trusted
+        if state != KazooState.CONNECTED:
+            self._cache.clear()
+
+        # Mirror's watches are gone with the session
+        if state == KazooState.LOST:
+            self.unmirror()
+
+    def _children_changed(self, event):
+        self._cache.invalidate(event.path)
+
+    def _invalidate_parents(self, path):
+        parent = os.path.dirname(path)
+        while parent != path:
+            self._cache.invalidate(parent)
+            path, parent = parent, os.path.dirname(parent)
+
+    @property
+    def mirror_root(self):
+        return self._mirror.root if self._mirror else None
+
+    def mirror(self, path, inflight=DEFAULT_INFLIGHT):
+        """Loads the subtree into a local mirror, which then serves reads under path."""
+        self.stat(path)
+        self.unmirror()
+
+        mirror = Mirror(self._zookeeper, path, inflight)
+        mirror.start()
+        self._mirror = mirror
+
+        return len(mirror)
+
+    def unmirror(self):
+        if self._mirror:
+            self._mirror.stop()
+            self._mirror = None
+
+    def watch(self, path, recursive=False, inflight=DEFAULT_INFLIGHT):
+        """Returns a started Watcher of the node (or its subtree), which may not exist yet."""
+        watcher = Watcher(self._zookeeper, path, recursive, inflight)
+        watcher.start()
+        return watcher
+
+    def _mirrored(self, path):
+        mirror = self._mirror
+        if mirror and mirror.covers(path):
+            return mirror.get(path)
+
+        return None
+
+    def list(self, path, limit=None):
+        """Returns node's children, served from the mirror or cache when possible.
+
+        With `limit`, the children count is checked first and lists longer than
+        that are not fetched. The returned list is shared with the mirror or cache
+        and must not be modified.
+        """
+        mirrored = self._mirrored(path)
+        if mirrored:
+            return mirrored.children
+
+        children = self._cache.get(path)
+        if children is not None:
+            return children
+
+        if limit:
+            count = self.stat(path).children_count
+            if count > limit:
+                raise ZooKeeperException("Node {} has {} children, more than the limit of {}".format(
+                    path, count, limit))
+
+        generation = self._cache.generation
         try:
-            return self._zookeeper.get_children(path)
+            children = self._zookeeper.get_children(path, watch=self._children_changed)
         except NoNodeError:
             raise ZooKeeperException("No such node: {}".format(path))
         except NoAuthError:
             raise ZooKeeperException("No access to list node: {}".format(path))
 
-    def get(self, path):
-        try:
-            value, _ = self._zookeeper.get(path)
-            if value:
-                value = value.decode('utf-8')
-            else:
-                value = ""
+        self._cache.put(path, children, generation)
+        return children
+
+    def walk(self, path, maxdepth=None, inflight=DEFAULT_INFLIGHT, onerror=None,
+             include_data=False, sort=True):
+        """Walks the tree breadth-first, yielding (path, depth, children, stat) tuples.
+
+        Up to `inflight` get_children requests are pipelined at once. Results are
+        yielded in the order requests were issued and children are sorted (unless
+        `sort` is False), so the output is deterministic. Nodes at `maxdepth` are
+        not listed. Errors of the root raise ZooKeeperException; errors of other
+        nodes (e.g. deleted during the walk) are passed to `onerror` (if given)
+        and the failing node is skipped. With `include_data`, node's stat comes
+        with its listing at no extra request; otherwise stat may be None.
+        """
+        if self._mirrored(path):
+            yield from self._mirror.walk(path, maxdepth, sort)
+            return
+
+        queue = deque()
+        if maxdepth is None or maxdepth > 0:
+            queue.append((path, 0))
+
+        pending = deque()
+        while queue or pending:
+            while queue and len(pending) < inflight:
+                node, depth = queue.popleft()
+                result = self._zookeeper.get_children_async(node, include_data=include_data)
+                pending.append((node, depth, result))
 
-            return value
+            node, depth, result = pending.popleft()
+            try:
+                children = self._children_result(node, result)
+            except ZooKeeperException as exc:
+                if not depth:
+                    raise
+                if onerror:
+                    onerror(exc)
+                continue
+
+            stat = None
+            if include_data:
+                children, stat = children
+
+            if sort:
+                children = sorted(children)
+
+            yield node, depth, children, stat
+
+            if maxdepth is None or depth + 1 < maxdepth:
+                queue.extend((os.path.join(node, child), depth + 1) for child in children)
+
+    def _children_result(self, path, result):
+        try:
+            return result.get()
         except NoNodeError:
             raise ZooKeeperException("No such node: {}".format(path))
         except NoAuthError:
-            raise ZooKeeperException("No access to get node: {}".format(path))
+            raise ZooKeeperException("No access to list node: {}".format(path))
+
+    def usage(self, path, maxdepth=0, inflight=DEFAULT_INFLIGHT, onerror=None):
+        """Returns {path: [data size, node count]} for subtrees rooted up to `maxdepth` below path.
+
+        Stats come with the walk's listings, so no data is fetched. Only the running
+        totals of these subtrees are kept, not the walked nodes.
+        """
+        totals = {}
+        for node, _, _, stat in self.walk(path, inflight=inflight, onerror=onerror, include_data=True):
+            parts = node[len(path):].strip('/').split('/') if node != path else []
+
+            for depth in range(min(len(parts), maxdepth) + 1):
+                ancestor = os.path.join(path, *parts[:depth])
+                total = totals.setdefault(ancestor, [0, 0])
+                total[0] += stat.data_length
+                total[1] += 1
+
+        return totals
+
+    def get_many(self, paths, inflight=DEFAULT_INFLIGHT):
+        """Yields (path, data) for each of the paths, pipelining get requests.
+
+        Data is returned as raw bytes, in the order of paths.
+        """
+        def request(node):
+            mirrored = self._mirrored(node)
+            return mirrored if mirrored else self._zookeeper.get_async(node)
+
+        for node, result in pipeline(paths, request, inflight):
+            if isinstance(result, MirrorNode):
+                data = result.data
+            else:
+                try:
+                    data, _ = result.get()
+                except NoNodeError:
+                    raise ZooKeeperException("No such node: {}".format(node))
+                except NoAuthError:
+                    raise ZooKeeperException("No access to get node: {}".format(node))
+
+            yield node, data or b""
+
+    def glob(self, pattern):
+        """Returns sorted paths of existing nodes matching the shell-style pattern."""
+        matches = ['/']
+        unchecked = False
+
+        for part in pattern.strip('/').split('/'):
+            if not glob.has_magic(part):
+                matches = [os.path.join(match, part) for match in matches]
+                unchecked = True
+                continue
+
+            unchecked = False
+
+            expanded = []
+            for match in matches:
+                try:
+                    children = self.list(match)
+                except ZooKeeperException:
+                    continue
+                expanded.extend(os.path.join(match, child) for child in sorted(fnmatch.filter(children, part)))
+            matches = expanded
+
+        # Nodes listed for the last wildcard exist, plain names after it have to be checked
+        if unchecked:
+            matches = [match for match, _ in self.stats(matches)]
+
+        return matches
+
+    def stats(self, paths, inflight=DEFAULT_INFLIGHT):
+        """Yields (path, stat) for each of the paths, pipelining exists requests.
+
+        Nodes that no longer exist are skipped.
+        """
+        def request(node):
+            mirrored = self._mirrored(node)
+            return mirrored.stat if mirrored else self._zookeeper.exists_async(node)
+
+        for node, result in pipeline(paths, request, inflight):
+            stat = result if isinstance(result, ZnodeStat) else result.get()
+            if stat is not None:
+                yield node, stat
+
+    def read_tree(self, path, inflight=DEFAULT_INFLIGHT, onerror=None, maxdepth=None, acls=True):
+        """Yields a Record for every node of the subtree, in walk order.
+
+        Data and ACL requests are pipelined on top of the walk's listings. Data
+        is kept as raw bytes. Nodes deleted during the walk are skipped, but a
+        root that can't be read raises ZooKeeperException. Only nodes above
+        `maxdepth` are read, 1 reads the node alone. Without `acls`, ACLs are
+        not fetched and Records' acl is None.
+        """
+        def request(item):
+            node = item[0]
+            return self._zookeeper.get_async(node), self._zookeeper.get_acls_async(node) if acls else None
+
+        listing = self.walk(path, maxdepth, inflight=inflight, onerror=onerror)
+        for (node, _, _, _), (data_result, acl_result) in pipeline(listing, request, inflight):
+            try:
+                data, stat = data_result.get()
+                acl, _ = acl_result.get() if acl_result else (None, None)
+            except NoNodeError:
+                if node == path:
+                    raise ZooKeeperException("No such node: {}".format(node))
+                continue
+            except NoAuthError:
+                error = ZooKeeperException("No access to get node: {}".format(node))
+                if node == path:
+                    raise error
+                if onerror:
+                    onerror(error)
+                continue
+
+            yield Record(node, data, stat, acl)
+
+    def read_tree_delta(self, path, base, inflight=DEFAULT_INFLIGHT, onerror=None):
+        """Yields Records of nodes changed since the `base` snapshot and Deletions of removed ones.
+
+        `base` is {path: Record} as returned by read_snapshot, stats are enough.
+        Every node gets an exists request; data and ACLs are fetched only if its
+        mzxid or ACL version differ from the base, and children are listed only
+        if its pzxid does, otherwise the base's child names are used. A node
+        that only gained or lost children has no record of its own, so later
+        deltas on top of this one list its children again. Records
+        come parent-first, so the delta can be loaded like a full dump.
+        """
+        base_children = {}
+        for node in base:
+            if node != path:
+                base_children.setdefault(os.path.dirname(node), []).append(os.path.basename(node))
+
+        def changed(stat, record):
+            return (record is None or stat.czxid != record.stat.czxid or stat.mzxid != record.stat.mzxid
+                    or stat.pzxid != record.stat.pzxid or stat.aversion != record.stat.aversion)
+
+        def fetch(node, stat, record):
+            created = record is None or stat.czxid != record.stat.czxid
+            listing = None
+            if created or stat.pzxid != record.stat.pzxid:
+                listing = self._zookeeper.get_children_async(node)
+            if created or stat.mzxid != record.stat.mzxid or stat.aversion != record.stat.aversion:
+                return node, record, self._zookeeper.get_async(node), self._zookeeper.get_acls_async(node), listing
+            return node, record, None, None, listing
+
+        queue = deque([path])
+        checks = deque()
+        fetches = deque()
+
+        while queue or checks or fetches:
+            while queue and len(checks) < inflight:
+                node = queue.popleft()
+                checks.append((node, self._zookeeper.exists_async(node)))
+
+            # Fetches are resolved in order, so parents come before their children
+            if fetches and (len(fetches) >= inflight or not checks):
+                node, record, data_result, acl_result, listing = fetches.popleft()
+                try:
+                    if data_result:
+                        data, stat = data_result.get()
+                        acl, _ = acl_result.get()
+                    children = listing.get() if listing else base_children.get(node, [])
+                except NoNodeError:
+                    if record:
+                        yield Deletion(node)
+                    continue
+                except NoAuthError:
+                    if onerror:
+                        onerror(ZooKeeperException("No access to get node: {}".format(node)))
+                    continue
+
+                if data_result:
+                    yield Record(node, data, stat, acl)
+
+                if listing:
+                    for child in sorted(set(base_children.get(node, [])) - set(children)):
+                        yield Deletion(os.path.join(node, child))
+                queue.extend(os.path.join(node, child) for child in sorted(children))
+                continue
+
+            node, result = checks.popleft()
+            stat = result.get()
+            record = base.get(node)
+
+            if stat is None:
+                if record:
+                    yield Deletion(node)
+                elif node == path:
+                    raise ZooKeeperException("No such node: {}".format(path))
+                continue
+
+            if changed(stat, record):
+                fetches.append(fetch(node, stat, record))
+            else:
+                queue.extend(os.path.join(node, child) for child in base_children.get(node, []))
+
+    def read_data(self, path, maxdepth=None, max_size=None, inflight=DEFAULT_INFLIGHT, onerror=None):
+        """Yields (path, data) for nodes of the subtree down to `maxdepth`, in walk order.
+
+        Sizes come with the walk's listings, so nodes with more than `max_size`
+        bytes of data are skipped without fetching it, and empty nodes need no
+        request at all. Data is kept as raw bytes; nodes deleted during the walk
+        are skipped.
+        """
+        def request(item):
+            node, stat = item
+            if not stat.data_length:
+                return None
+
+            mirrored = self._mirrored(node)
+            return mirrored if mirrored else self._zookeeper.get_async(node)
+
+        listing = ((node, stat) for node, _, _, stat in self.walk(path, maxdepth, inflight, onerror,
+                                                                   include_data=True)
+                   if max_size is None or stat.data_length <= max_size)
+
+        for (node, _), result in pipeline(listing, request, inflight):
+            if result is None:
+                data = b""
+            elif isinstance(result, MirrorNode):
+                data = result.data
+            else:
+                try:
+                    data, _ = result.get()
+                except NoNodeError:
+                    continue
+                except NoAuthError:
+                    if onerror:
+                        onerror(ZooKeeperException("No access to get node: {}".format(node)))
+                    continue
+
+            yield node, data or b""
+
+    def diff(self, path, other, records=None, inflight=DEFAULT_INFLIGHT, onerror=None, other_cluster=None):
+        """Compares the subtree with another one, or with dump records of `other` if given.
+
+        The other subtree is read from `other_cluster` (another ZooKeeper)
+        if given, so trees of different clusters can be compared directly.
+        Yields (change, relative path) tuples, see zoocli.diff.diff.
+        """
+        if records is not None:
+            other = DumpSide(other, records)
+        else:
+            other = TreeSide((other_cluster or self)._zookeeper, other)
+        return diff(TreeSide(self._zookeeper, path), other, inflight, onerror)
+
+    def get(self, path):
+        mirrored = self._mirrored(path)
+        if mirrored:
+            value = mirrored.data
+        else:
+            try:
+                value, _ = self._zookeeper.get(path)
+            except NoNodeError:
+                raise ZooKeeperException("No such node: {}".format(path))
+            except NoAuthError:
+                raise ZooKeeperException("No access to get node: {}".format(path))
+
+        if value:
+            value = value.decode('utf-8')
+        else:
+            value = ""
+
+        return value
 
     def set(self, path, data):
+        data = data.encode()
+
         try:
-            self._zookeeper.set(path, data.encode())
+            stat = self._zookeeper.set(path, data)
         except NoNodeError:
             raise ZooKeeperException("No such node: {}".format(path))
         except NoAuthError:
             raise ZooKeeperException("No access to set data on node: {}".format(path))
 
+        if self._mirrored(path):
+            self._mirror.update(path, data, stat)
+
     def create(self, path, data=None, ephemeral=False, sequence=False, makepath=False):
         if data:
             data = data.encode()
@@ -68,11 +546,11 @@ class ZooKeeper(object):
             data = b""
 
         try:
-            self._zookeeper.create(path,
-                                   value=data,
-                                   ephemeral=ephemeral,
-                                   sequence=sequence,
-                                   makepath=makepath)
+            created = self._zookeeper.create(path,
+                                              value=data,
+                                              ephemeral=ephemeral,
+                                              sequence=sequence,
+                                              makepath=makepath)
         except NoNodeError:
             raise ZooKeeperException("No such node: {}".format(path))
         except NodeExistsError:
@@ -80,6 +558,12 @@ class ZooKeeper(object):
         except NoAuthError:
             raise ZooKeeperException("No access to create node: {}".format(path))
 
+        self._invalidate_parents(path)
+
+        mirror = self._mirror
+        if mirror and mirror.covers(created):
+            mirror.refresh(created)
+
     def delete(self, path, recursive=False):
         try:
             self._zookeeper.delete(path, recursive=recursive)
@@ -90,50 +574,398 @@ class ZooKeeper(object):
         except NoAuthError:
             raise ZooKeeperException("No access to delete node: {}".format(path))
 
-    def stat(self, path):
+        self._cache.invalidate(path)
+        self._invalidate_parents(path)
+
+        if self._mirrored(path):
+            self._mirror.remove(path)
+
+    def delete_tree(self, path, batch_size=DEFAULT_BATCH_SIZE, inflight=DEFAULT_INFLIGHT, progress=None):
+        """Deletes the node and all its sub-nodes, returning the number of deleted nodes.
+
+        The subtree is listed with a pipelined walk and removed bottom-up in
+        multi-op transactions of `batch_size` deletes. ZooKeeper executes requests
+        of a session in order, so children are always gone before their parent's
+        batch runs. A batch that fails (e.g. because another client created or
+        deleted a node meanwhile) is retried node by node. `progress` is called
+        with (deleted, total) after each batch. A missing or unreadable node,
+        the root or any below it, raises ZooKeeperException before anything is
+        deleted.
+        """
+        def fail(exc):
+            # A node left out would fail its parent's delete and every retry of it
+            raise exc
+
+        nodes = [node for node, _, _, _ in self.walk(path, inflight=inflight, onerror=fail)]
+        nodes.reverse()
+
+        def commit(batch):
+            transaction = self._zookeeper.transaction()
+            for node in batch:
+                transaction.delete(node)
+            return transaction.commit_async()
+
+        deleted = 0
+        for batch, result in pipeline(batches(nodes, batch_size), commit, inflight):
+            if failed(result.get()):
+                for node in batch:
+                    deleted += self._delete_node(node, batch_size, inflight)
+            else:
+                deleted += len(batch)
+
+            if progress:
+                progress(deleted, len(nodes))
+
+        for node in nodes:
+            self._cache.invalidate(node)
+        self._invalidate_parents(path)
+
+        if self._mirrored(path):
+            self._mirror.remove(path)
+
+        return deleted
+
+    def _delete_node(self, path, batch_size, inflight):
         try:
-            _, stat = self._zookeeper.get(path)
-            return stat
+            self._zookeeper.delete(path)
+            return 1
         except NoNodeError:
-            raise ZooKeeperException("No such node: {}".format(path))
+            # Already deleted by another client
+            return 0
+        except NotEmptyError:
+            # Another client created sub-nodes meanwhile, start over for this node
+            deleted = self.delete_tree(path, batch_size, inflight)
+            if not deleted:
+                raise ZooKeeperException("Node contains sub-nodes: {}".format(path))
+            return deleted
+        except NoAuthError:
+            raise ZooKeeperException("No access to delete node: {}".format(path))
+        except ZookeeperError as exc:
+            raise ZooKeeperException("Failed to delete node {}: {}".format(path, exc))
 
-    def get_acl(self, path):
+    def load_tree(self, records, root, target=None, mode='fail', acl=False,
+                  batch_size=DEFAULT_BATCH_SIZE, inflight=DEFAULT_INFLIGHT, progress=None):
+        """Creates nodes from dump records, returning (created, updated, skipped) counts.
+
+        Records must come parent-first, as written by dump. Paths are moved from
+        `root` to `target` (if given). Creates are sent in multi-op transactions
+        of `batch_size` with up to `inflight` batches pending; ZooKeeper executes
+        them in order, so parents exist before their children's batch runs.
+        A failed batch is retried node by node, where existing nodes are handled
+        according to `mode`: 'fail', 'skip' or 'overwrite'. With `acl`, dumped
+        ACLs are applied as well. Ephemeral nodes are not restored. In 'fail'
+        mode, an existing root fails the load before anything is created.
+        """
+        def remap(record):
+            if target is None:
+                return record
+
+            relative = record.path[len(root):].lstrip('/') if record.path != root else ''
+            path = os.path.join(target, relative) if relative else target
+            return record._replace(path=path)
+
+        def restorable(record):
+            return record.path != '/' and not record.stat.ephemeralOwner
+
+        def commit(batch):
+            transaction = self._zookeeper.transaction()
+            for record in batch:
+                transaction.create(record.path, record.data or b"", acl=record.acl if acl else None)
+            return transaction.commit_async()
+
+        loaded = root if target is None else target
+        if mode == 'fail' and loaded != '/':
+            self._check_missing(loaded)
+
+        if target is not None and os.path.dirname(target) != target:
+            self._zookeeper.ensure_path(os.path.dirname(target))
+
+        records = filter(restorable, map(remap, records))
+        counts = {'created': 0, 'updated': 0, 'skipped': 0}
+
+        for batch, result in pipeline(batches(records, batch_size), commit, inflight):
+            if failed(result.get()):
+                for record in batch:
+                    counts[self._load_node(record, mode, acl)] += 1
+            else:
+                counts['created'] += len(batch)
+
+            for record in batch:
+                self._cache.invalidate(os.path.dirname(record.path))
+
+            if progress:
+                progress(counts['created'], counts['updated'], counts['skipped'])
+
+        self._invalidate_parents(loaded)
+
+        mirror = self._mirror
+        if mirror and mirror.covers(loaded):
+            mirror.refresh(loaded)
+
+        return counts['created'], counts['updated'], counts['skipped']
+
+    def _load_node(self, record, mode, acl):
+        path = record.path
         try:
-            acl, _ = self._zookeeper.get_acls(path)
-            return acl
+            self._zookeeper.create(path, record.data or b"", acl=record.acl if acl else None)
+            return 'created'
+        except NodeExistsError:
+            if mode == 'skip':
+                return 'skipped'
+            elif mode != 'overwrite':
+                raise ZooKeeperException("Node already exists: {}".format(path))
+        except NoNodeError:
+            raise ZooKeeperException("No such node: {}".format(os.path.dirname(path)))
+        except NoAuthError:
+            raise ZooKeeperException("No access to create node: {}".format(path))
+        except ZookeeperError as exc:
+            raise ZooKeeperException("Failed to create node {}: {}".format(path, exc))
+
+        try:
+            self._zookeeper.set(path, record.data or b"")
+            if acl:
+                self._zookeeper.set_acls(path, record.acl)
         except NoNodeError:
             raise ZooKeeperException("No such node: {}".format(path))
+        except NoAuthError:
+            raise ZooKeeperException("No access to set data on node: {}".format(path))
 
-    def add_acl(self, path, permissions, scheme, id):
-        perms = get_permissions(permissions)
+        return 'updated'
 
-        if scheme == "digest":
-            username, password = id.split(":")
-            acl = make_digest_acl(username, password, **perms)
-        else:
-            acl = make_acl(scheme, id, **perms)
+    def copy_tree(self, path, target, destination=None, recursive=True, mode='fail', acl=False,
+                  batch_size=DEFAULT_BATCH_SIZE, inflight=DEFAULT_INFLIGHT, progress=None, onerror=None):
+        """Copies the node (with its subtree if `recursive`) to `target`, returning load_tree's counts.
+
+        Nodes are copied to `destination` (another ZooKeeper) if given, so
+        subtrees can be copied between clusters. Records stream from the
+        pipelined read_tree straight into load_tree's transactions, the subtree
+        is never held in memory.
+        """
+        destination = destination or self
+        records = self.read_tree(path, inflight, onerror, maxdepth=None if recursive else 1, acls=acl)
+        return destination.load_tree(records, path, target, mode, acl, batch_size, inflight, progress)
+
+    def move_tree(self, path, target, destination=None, acl=False,
+                  batch_size=DEFAULT_BATCH_SIZE, inflight=DEFAULT_INFLIGHT, progress=None):
+        """Moves the subtree to `target`, returning the number of moved nodes.
+
+        The subtree is copied like copy_tree, remembering the data version of
+        every node read. Only once all creates are committed, the source is
+        deleted bottom-up in transactions checking those versions, so nodes
+        changed, given new children or deleted by another client during the
+        copy are not deleted. Ephemeral nodes can't be copied, so they stay
+        at the source as well. Those and their parents are kept at the source
+        and ZooKeeperException is raised after the rest is deleted.
+        """
+        versions = []
+        ephemeral = []
+
+        def fail(exc):
+            raise exc
+
+        def remember(records):
+            for record in records:
+                # Skipped by load_tree, only created nodes are deleted
+                if record.stat.ephemeralOwner:
+                    ephemeral.append(record.path)
+                    continue
+                versions.append((record.path, record.stat.version))
+                yield record
+
+        destination = destination or self
+        records = remember(self.read_tree(path, inflight, onerror=fail, acls=acl))
+        destination.load_tree(records, path, target, 'fail', acl, batch_size, inflight, progress)
+
+        versions.reverse()
+
+        def commit(batch):
+            transaction = self._zookeeper.transaction()
+            for node, version in batch:
+                transaction.delete(node, version)
+            return transaction.commit_async()
+
+        deleted = 0
+        changed = []
+        for batch, result in pipeline(batches(versions, batch_size), commit, inflight):
+            if not failed(result.get()):
+                deleted += len(batch)
+                continue
+
+            # Parents of changed nodes are not empty, so they are kept as well
+            for node, version in batch:
+                if self._delete_version(node, version):
+                    deleted += 1
+                else:
+                    changed.append(node)
+
+        for node, _ in versions:
+            self._cache.invalidate(node)
+        self._invalidate_parents(path)
+
+        mirror = self._mirror
+        if mirror and mirror.covers(path):
+            if changed or ephemeral:
+                mirror.refresh(path)
+            else:
+                mirror.remove(path)
+
+        kept = ephemeral + changed
+        if kept:
+            raise ZooKeeperException("Moved {} of {} nodes, kept {} at the source as they are ephemeral, or they or "
+                                     "their sub-nodes changed during the move, first: {}".format(
+                                         deleted, len(versions), len(kept), kept[0]))
 
-        current_acls = self.get_acl(path)
-        current_acls.append(acl)
+        return deleted
 
+    def _check_missing(self, path):
+        # Batches sent after a failed one may still succeed, so existing targets are refused upfront
+        if self._zookeeper.exists(path):
+            raise ZooKeeperException("Node already exists: {}".format(path))
+
+    def _delete_version(self, path, version):
         try:
-            self._zookeeper.set_acls(path, current_acls)
-        except NoNodeError:
-            raise ZooKeeperException("No such node: {}".format(path))
-        except InvalidACLError as exc:
-            raise ZooKeeperException("Invalid ACL format: {}".format(str(exc)))
+            self._zookeeper.delete(path, version)
+            return True
+        except (BadVersionError, NotEmptyError, NoNodeError):
+            return False
         except NoAuthError:
-            raise ZooKeeperException("No access to add acl on node: {}".format(path))
+            raise ZooKeeperException("No access to delete node: {}".format(path))
+        except ZookeeperError as exc:
+            raise ZooKeeperException("Failed to delete node {}: {}".format(path, exc))
 
-    def delete_acl(self, path, index):
-        current_acls = self.get_acl(path)
-        deleted = current_acls.pop(index)
+    def stat(self, path):
+        mirrored = self._mirrored(path)
+        if mirrored:
+            return mirrored.stat
+
+        # Unlike get, exists doesn't transfer node's data
+        stat = self._zookeeper.exists(path)
+        if stat is None:
+            raise ZooKeeperException("No such node: {}".format(path))
+
+        return stat
 
+    def get_acl(self, path):
         try:
-            self._zookeeper.set_acls(path, current_acls)
+            acl, _ = self._zookeeper.get_acls(path)
+            return acl
         except NoNodeError:
             raise ZooKeeperException("No such node: {}".format(path))
-        except NoAuthError:
-            raise ZooKeeperException("No access to delete acl from node: {}".format(path))
 
+    def add_acl(self, path, permissions, scheme, id):
+        self.change_acl(path, adding_acl(make_acl_entry(permissions, scheme, id)))
+
+    def delete_acl(self, path, index):
+        try:
+            deleted = self.get_acl(path)[index]
+        except IndexError:
+            raise ZooKeeperException("No ACL with index {} on node: {}".format(index, path))
+
+        # Removed by value, in case the ACL changes before it is written
+        self.change_acl(path, lambda acl: [entry for entry in acl if entry != deleted] if deleted in acl else None)
         return deleted
+
+    def change_acl(self, path, change):
+        """Applies the ACL change to the node, returning whether it didn't comply already.
+
+        The ACL is written with a check of the ACL version it was read with,
+        and read again if another client changed it meanwhile.
+        """
+        for _ in range(ACL_RETRIES):
+            try:
+                acl, stat = self._zookeeper.get_acls(path)
+            except NoNodeError:
+                raise ZooKeeperException("No such node: {}".format(path))
+
+            new_acl = change(acl)
+            if new_acl is None:
+                return False
+
+            try:
+                stat = self._zookeeper.set_acls(path, new_acl, stat.aversion)
+            except BadVersionError:
+                continue
+            except NoNodeError:
+                raise ZooKeeperException("No such node: {}".format(path))
+            except InvalidACLError as exc:
+                raise ZooKeeperException("Invalid ACL format: {}".format(str(exc)))
+            except NoAuthError:
+                raise ZooKeeperException("No access to set acl on node: {}".format(path))
+
+            self._update_mirror_stat(path, stat)
+            return True
+
+        raise ZooKeeperException("ACL of {} keeps being changed by other clients".format(path))
+
+    def audit_acls(self, path, change, recursive=True, inflight=DEFAULT_INFLIGHT, onerror=None):
+        """Yields (node, acl, stat, new acl) of nodes whose ACL doesn't comply with the change.
+
+        ACLs are fetched concurrently, keeping up to `inflight` requests on top
+        of the walk's listings. A root that can't be read raises
+        ZooKeeperException, so a missing path doesn't pass as compliant.
+        """
+        def request(item):
+            return self._zookeeper.get_acls_async(item[0])
+
+        listing = self.walk(path, None if recursive else 1, inflight=inflight, onerror=onerror)
+        for (node, _, _, _), result in pipeline(listing, request, inflight):
+            try:
+                acl, stat = result.get()
+            except NoNodeError:
+                if node == path:
+                    raise ZooKeeperException("No such node: {}".format(node))
+                continue
+            except NoAuthError:
+                error = ZooKeeperException("No access to get acl of node: {}".format(node))
+                if node == path:
+                    raise error
+                if onerror:
+                    onerror(error)
+                continue
+
+            new_acl = change(acl)
+            if new_acl is not None:
+                yield node, acl, stat, new_acl
+
+    def update_acls(self, path, change, recursive=True, inflight=DEFAULT_INFLIGHT, onerror=None):
+        """Applies the ACL change to the subtree, returning the number of changed nodes.
+
+        Only nodes not complying with the change are written, with up to
+        `inflight` version-checked set_acls requests pending (transactions
+        can't set ACLs). Nodes whose ACL was changed by another client since
+        it was read are retried one by one with change_acl.
+        """
+        def request(item):
+            node, _, stat, new_acl = item
+            return self._zookeeper.set_acls_async(node, new_acl, stat.aversion)
+
+        changes = self.audit_acls(path, change, recursive, inflight, onerror)
+        updated = 0
+        for (node, _, _, _), result in pipeline(changes, request, inflight):
+            try:
+                stat = result.get()
+            except BadVersionError:
+                try:
+                    updated += self.change_acl(node, change)
+                except ZooKeeperException as exc:
+                    if onerror:
+                        onerror(exc)
+                continue
+            except NoNodeError:
+                continue
+            except InvalidACLError as exc:
+                raise ZooKeeperException("Invalid ACL format: {}".format(str(exc)))
+            except NoAuthError:
+                if onerror:
+                    onerror(ZooKeeperException("No access to set acl on node: {}".format(node)))
+                continue
+
+            self._update_mirror_stat(node, stat)
+            updated += 1
+
+        return updated
+
+    def _update_mirror_stat(self, path, stat):
+        mirrored = self._mirrored(path)
+        if mirrored:
+            self._mirror.update(path, mirrored.data, stat)